@@ -0,0 +1,213 @@
+import argparse
+import os
+import resource
+import shutil
+import tempfile
+import time
+import mongoengine
+from pymongo import monitoring
+from src.benchmarks.Synthetic import SyntheticData
+from src.mainAPI.courses.db.Connector import main_conn
+from src.mainAPI.courses.db.Parser import Parser
+from src.utils import config
+
+
+# Database used by the benchmarks, it is dropped before each run.
+default_database = "METU_BENCHMARK"
+default_host = "mongodb://localhost:27017"
+
+# Commands sent by the driver itself, they are not counted as queries.
+driver_commands = {"hello", "ismaster", "isMaster", "ping", "buildInfo", "endSessions", "saslStart", "saslContinue"}
+
+# Collection methods counted when the in-process stand-in is used.
+mock_methods = ["find", "insert_one", "insert_many", "update_one", "replace_one", "bulk_write", "aggregate"]
+
+modes = ["row", "bulk", "upsert"]
+
+
+class QueryCounter(monitoring.CommandListener):
+    """
+    QueryCounter counts the commands sent to the database. It listens to the driver
+    events for a real server, and wraps the collection methods for the in-process
+    stand-in, as it does not publish any command event.
+
+    """
+    def __init__(self):
+        self.count = 0
+
+        # Original methods of the wrapped collection class, restored after the run.
+        self.wrapped = dict()
+
+    def started(self, event):
+        if event.command_name not in driver_commands:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def wrap_mock(self, collection_cls):
+        for method_name in mock_methods:
+            method = collection_cls.__dict__[method_name]
+            self.wrapped[(collection_cls, method_name)] = method
+
+            def counted(*args, __method=method, **kwargs):
+                self.count += 1
+                return __method(*args, **kwargs)
+
+            setattr(collection_cls, method_name, counted)
+        return self
+
+    def unwrap_mock(self):
+        for (collection_cls, method_name), method in self.wrapped.items():
+            setattr(collection_cls, method_name, method)
+        self.wrapped = dict()
+        return self
+
+    def reset(self):
+        self.count = 0
+        return self
+
+
+def _connect(counter: QueryCounter, host: str, database: str, mock: bool):
+    if database == config.name:
+        raise ValueError(
+            f"Benchmarks drop their database, please use another database than {config.name}."
+        )
+    main_conn.disconnect_all()
+    if mock:
+        import mongomock
+        counter.wrap_mock(mongomock.collection.Collection)
+        mongoengine.connect(
+            db=database,
+            host="mongodb://localhost",
+            alias=main_conn.alias,
+            mongo_client_class=mongomock.MongoClient
+        )
+    else:
+        # The listener is given to this client only, so it is dropped with the client.
+        mongoengine.connect(
+            db=database,
+            host=host,
+            alias=main_conn.alias,
+            event_listeners=[counter]
+        )
+    main_conn.name = database
+    main_conn.set_online(True)
+    mongoengine.get_connection(main_conn.alias).drop_database(database)
+
+
+def _peak_rss() -> float:
+    # Peak resident set size of the process in megabytes, Linux reports kilobytes.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_benchmark(
+        rows: int = 10000,
+        mode: str = "bulk",
+        stream: bool = False,
+        batch_size: int = 1000,
+        host: str = default_host,
+        database: str = default_database,
+        mock: bool = False,
+        path: str = None,
+        seed: int = 0
+) -> dict:
+    """
+    Generates a synthetic workbook and ingests it with the given parser mode.
+
+    :param int rows: Number of synthetic rows.
+    :param str mode: One of 'row' (record by record), 'bulk' or 'upsert'.
+    :param bool stream: Read the workbooks with the streaming reader.
+    :param int batch_size: Batch size of the bulk writes.
+    :param str host: Host of the local mongod.
+    :param str database: Benchmark database, it is dropped before the run.
+    :param bool mock: Use the in-process stand-in (mongomock) instead of a server.
+    :param str path: Directory for the generated workbooks, a temporary one by default.
+    :param int seed: Seed of the synthetic data.
+    :return: Results of the run.
+    """
+    if mode not in modes:
+        raise ValueError(f"Mode must be one of {modes}: {mode}")
+
+    counter = QueryCounter()
+    temporary = path is None
+    path = path or tempfile.mkdtemp(prefix="metu_benchmark_")
+    try:
+        _connect(counter, host=host, database=database, mock=mock)
+        tick = time.time()
+        files = SyntheticData(seed=seed).write(
+            count=rows,
+            path=path
+        )
+        generation_time = time.time() - tick
+
+        counter.reset()
+        tick = time.time()
+        for file_path in files:
+            directory, file = os.path.split(file_path)
+            Parser().load(
+                file=file,
+                path=directory + os.sep,
+                stream=stream
+            ).parse(
+                bulk=mode == "bulk",
+                upsert=mode == "upsert",
+                batch_size=batch_size
+            )
+        ingestion_time = time.time() - tick
+    finally:
+        counter.unwrap_mock()
+        if temporary:
+            shutil.rmtree(path, ignore_errors=True)
+
+    return {
+        "mode": mode,
+        "stream": stream,
+        "rows": rows,
+        "files": len(files),
+        "generation_seconds": generation_time,
+        "ingestion_seconds": ingestion_time,
+        "rows_per_second": rows / ingestion_time if ingestion_time > 0 else 0,
+        "queries": counter.count,
+        "queries_per_row": counter.count / rows if rows > 0 else 0,
+        "peak_rss_mb": _peak_rss(),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Ingestion benchmark on synthetic course search exports."
+    )
+    arg_parser.add_argument("--rows", type=int, default=10000)
+    arg_parser.add_argument("--mode", choices=modes, default="bulk")
+    arg_parser.add_argument("--stream", action="store_true")
+    arg_parser.add_argument("--batch-size", type=int, default=1000)
+    arg_parser.add_argument("--host", default=default_host)
+    arg_parser.add_argument("--database", default=default_database)
+    arg_parser.add_argument("--mock", action="store_true")
+    arg_parser.add_argument("--path", default=None)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    results = run_benchmark(
+        rows=args.rows,
+        mode=args.mode,
+        stream=args.stream,
+        batch_size=args.batch_size,
+        host=args.host,
+        database=args.database,
+        mock=args.mock,
+        path=args.path,
+        seed=args.seed
+    )
+    for key, value in results.items():
+        if isinstance(value, float):
+            value = f"{value:.3f}"
+        print(f"{key:<20} {value}")
+
+
+if __name__ == "__main__":
+    main()
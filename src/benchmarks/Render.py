@@ -0,0 +1,111 @@
+import argparse
+import random
+import time
+import pandas as pd
+from src.utils.Utils import convert_df_to_html, render_html_table
+
+
+# Numbers of rows of the rendered tables.
+default_sizes = [100, 1000, 10000]
+
+statuses = ["Open", "Closed", "Cancelled"]
+titles = ["Prof. Dr.", "Assoc. Prof. Dr.", "Assist. Prof. Dr.", "Dr.", "Inst."]
+
+
+def synthetic_records(rows: int, seed: int = 0) -> list:
+    """
+    The function generates records in the form of the simplified course records,
+    with a few missing values as in the real exports.
+
+    :param int rows: Number of records.
+    :param int seed: Seed of the random generator.
+    :return: List of the record dictionaries.
+    """
+    generator = random.Random(seed)
+    records = list()
+    for index in range(rows):
+        year = 2022 - index // 300
+        records.append({
+            "semesterId": int(f"{year}{generator.randint(1, 3)}"),
+            "semesterName": f"{year}-{year + 1} Fall",
+            "courseSection": index % 300 + 1,
+            "courseCapacity": generator.choice([None, 30, 40, 60, 120]),
+            "courseStatus": generator.choice(statuses),
+            "instructorName": f"INSTRUCTOR & {generator.randint(1, 500)}",
+            "instructorTitle": generator.choice(titles),
+        })
+    return records
+
+
+def _best_time(function, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        tick = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - tick
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmark(sizes: list = None, repeat: int = 5, seed: int = 0) -> list:
+    """
+    Renders the same records with 'convert_df_to_html' on a DataFrame and with
+    'render_html_table', checks that their outputs are identical, and measures the
+    best time of each of them.
+
+    :param list sizes: Numbers of rows of the tables.
+    :param int repeat: Number of repetitions of each measurement.
+    :param int seed: Seed of the synthetic records.
+    :return: List of the results of each size.
+    """
+    results = list()
+    for rows in sizes or default_sizes:
+        records = synthetic_records(rows=rows, seed=seed)
+        expected = convert_df_to_html(
+            data=pd.DataFrame(data=records),
+            index=False
+        )
+        if render_html_table(records) != expected:
+            raise ValueError(f"Rendered table differs from 'convert_df_to_html' for {rows} rows.")
+
+        pandas_time = _best_time(
+            lambda: convert_df_to_html(data=pd.DataFrame(data=records), index=False),
+            repeat=repeat
+        )
+        render_time = _best_time(
+            lambda: render_html_table(records),
+            repeat=repeat
+        )
+        results.append({
+            "rows": rows,
+            "to_html_ms": pandas_time * 1000,
+            "render_ms": render_time * 1000,
+            "speedup": pandas_time / render_time if render_time > 0 else 0,
+        })
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="HTML table rendering benchmark on synthetic course records."
+    )
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=default_sizes)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    results = run_benchmark(
+        sizes=args.sizes,
+        repeat=args.repeat,
+        seed=args.seed
+    )
+    print(f"{'rows':>8} {'to_html (ms)':>14} {'render (ms)':>14} {'speedup':>9}")
+    for result in results:
+        print(
+            f"{result['rows']:>8} {result['to_html_ms']:>14.2f} "
+            f"{result['render_ms']:>14.2f} {result['speedup']:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
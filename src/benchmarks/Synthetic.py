@@ -0,0 +1,169 @@
+import os
+import random
+from openpyxl import Workbook
+from src.utils.Utils import schedule_features
+
+
+# Excel sheets could not hold more rows, larger data sets are split into files.
+max_rows_per_file = 1_000_000
+
+course_columns = [
+    "Semester",
+    "Course Code",
+    "Course Name",
+    "Course Type",
+    "Course Level",
+    "Service Course",
+    "Course Scheduler",
+    "Credit",
+    "ECTS Credit",
+    "Laboratory Credit",
+    "Theory Credit",
+    "Application Credit",
+    "Course Section",
+    "Capacity",
+    "Exchange Capacity",
+    "Exchange Used Capacity",
+    "Course Status",
+    "Instructor Name",
+    "Instructor Title",
+]
+max_schedule = 6
+schedule_columns = [
+    f"{feature} {index}" for index in range(1, max_schedule + 1) for feature in schedule_features
+]
+columns = course_columns + schedule_columns
+
+days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+hours = ["08:40", "09:40", "10:40", "11:40", "13:40", "14:40", "15:40", "16:40"]
+titles = ["Prof. Dr.", "Assoc. Prof. Dr.", "Assist. Prof. Dr.", "Dr.", "Inst."]
+buildings = ["MM", "BMB", "EA", "FZ", "U", "G", "K"]
+course_types = ["Must", "Elective", "Technical Elective"]
+course_levels = ["Undergraduate", "Graduate"]
+course_status = ["Open", "Closed", "Cancelled"]
+
+
+class SyntheticData:
+    """
+    SyntheticData generates spreadsheet rows in the same column layout of the course
+    search exports ('Semester', 'Course Code', 'Course Section', 'Day 1', ... 'Classroom 6'),
+    with a configurable number of distinct semesters, courses, instructors and rooms.
+    The generated rows are deterministic for a given seed.
+
+    """
+    def __init__(
+            self,
+            seed: int = 0,
+            semesters: int = 20,
+            courses: int = 2000,
+            instructors: int = 1500,
+            rooms: int = 400,
+            sections: int = 12
+    ):
+        self.random = random.Random(seed)
+        self.semesters = self._semesters(semesters)
+        self.courses = courses
+        self.instructors = instructors
+        self.rooms = rooms
+        self.sections = sections
+
+    @staticmethod
+    def _semesters(count: int) -> list:
+        names = list()
+        year = 2022
+        while len(names) < count:
+            for season in ["Fall", "Spring", "Summer"]:
+                names.append(f"{year}-{year + 1} {season}")
+            year -= 1
+        return names[:count]
+
+    def _course(self, index: int) -> dict:
+        credit = 2 + index % 3
+        return {
+            "Course Code": 5710000 + index,
+            "Course Name": f"SYNTHETIC COURSE {index}",
+            "Course Type": course_types[index % len(course_types)],
+            "Course Level": course_levels[index % len(course_levels)],
+            "Service Course": index % 5 == 0,
+            "Course Scheduler": f"DEPARTMENT {index % 40}",
+            "Credit": credit,
+            "ECTS Credit": credit * 2.0,
+            "Laboratory Credit": float(index % 2),
+            "Theory Credit": float(credit),
+            "Application Credit": 0.0,
+        }
+
+    def _schedule(self) -> dict:
+        schedule = dict.fromkeys(schedule_columns)
+        for index in range(1, self.random.randint(1, max_schedule) + 1):
+            start = self.random.randrange(len(hours) - 1)
+            room = self.random.randrange(self.rooms)
+            schedule[f"Day {index}"] = self.random.choice(days)
+            schedule[f"Start Hour {index}"] = hours[start]
+            schedule[f"End Hour {index}"] = hours[start + 1].replace(":40", ":30")
+            schedule[f"Classroom Building {index}"] = buildings[room % len(buildings)]
+            schedule[f"Classroom {index}"] = f"{buildings[room % len(buildings)]}-{room}"
+        return schedule
+
+    def rows(self, count: int):
+        # Rows are generated lazily, so millions of rows do not stay in memory.
+        for index in range(count):
+            course_index, section = divmod(index, self.sections)
+            semester_index, course_index = divmod(course_index, self.courses)
+            semester = self.semesters[semester_index % len(self.semesters)]
+            instructor = self.random.randrange(self.instructors)
+            capacity = self.random.choice([20, 40, 60, 80, 120])
+            row = {
+                "Semester": semester,
+                **self._course(course_index),
+                "Course Section": section + 1 + semester_index // len(self.semesters) * self.sections,
+                "Capacity": capacity,
+                "Exchange Capacity": capacity // 10,
+                "Exchange Used Capacity": self.random.randint(0, capacity // 10),
+                "Course Status": self.random.choice(course_status),
+                "Instructor Name": f"INSTRUCTOR {instructor}",
+                "Instructor Title": titles[instructor % len(titles)],
+                **self._schedule(),
+            }
+            yield row
+
+    def write(
+            self,
+            count: int,
+            path: str,
+            file_prefix: str = "SyntheticResults",
+            rows_per_file: int = max_rows_per_file
+    ) -> list:
+        """
+        Writes the given number of rows into workbooks under the given directory,
+        each workbook having at most 'rows_per_file' rows.
+
+        :return: Paths of the written workbooks.
+        """
+        os.makedirs(path, exist_ok=True)
+        rows_per_file = min(rows_per_file, max_rows_per_file)
+        files = list()
+        workbook = None
+        sheet = None
+        for index, row in enumerate(self.rows(count)):
+            if index % rows_per_file == 0:
+                if workbook is not None:
+                    workbook.save(files[-1])
+                files.append(
+                    os.path.join(path, f"{file_prefix} ({len(files) + 1}).xlsx")
+                )
+                workbook = Workbook(write_only=True)
+                sheet = workbook.create_sheet()
+                sheet.append(columns)
+            sheet.append([row[column] for column in columns])
+        if workbook is not None:
+            workbook.save(files[-1])
+        return files
+
+
+if __name__ == "__main__":
+    import sys
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    output_path = sys.argv[2] if len(sys.argv) > 2 else "synthetic"
+    for written_file in SyntheticData().write(count=row_count, path=output_path):
+        print(written_file)
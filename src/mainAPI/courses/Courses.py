@@ -1,10 +1,9 @@
-import json
-
 import mongoengine
 import pandas as pd
 
-from src.mainAPI.courses.db.Query import QueryPipeline
+from src.mainAPI.courses.db.Query import QueryPipeline, Parameter
 from src.mainAPI.courses.db.Connector import main_conn
+from src.mainAPI.courses.SingleFlight import single_flight
 from src.utils.Utils import Logger, get_doc_name
 import src.mainAPI.courses.db.MongoDB as db
 
@@ -22,7 +21,24 @@ class Course:
         if not main_conn.online:
             main_conn.connect()
 
+        # Identity map of the instance, each entity is fetched once until refreshed.
+        self.identity_map = dict()
+
+    def refresh(self):
+        self.identity_map = dict()
+        return self
+
     # -------HELPER FUNCTIONS--------
+    def _memoize(self, key: tuple, loader):
+        # Concurrent loads of the same entity of the same course are done once, the
+        # instances waiting for the load get their own copies of the entity.
+        if key not in self.identity_map:
+            self.identity_map[key] = single_flight.do(
+                (self.id,) + key,
+                loader
+            )
+        return self.identity_map[key]
+
     @staticmethod
     def _query_helper(query: QueryPipeline, operations: dict, steps: int):
         steps = range(steps)
@@ -39,7 +55,8 @@ class Course:
 
     # -------LOOKUP FUNCTIONS--------
     def schedule_look_up(
-            self
+            self,
+            fields: dict = None
     ) -> QueryPipeline:
 
         day_doc_name = get_doc_name(db.Day)
@@ -55,13 +72,22 @@ class Course:
             1: ["courseTime"],
             2: ["courseClass"],
         }
+        if fields is not None:
+            # Only the joins of the requested fields are done, and each of them
+            # carries only these fields, references are unwound by the join.
+            join_tables = {
+                index: join + [fields[join[3]], True]
+                for index, join in join_tables.items() if join[3] in fields
+            }
+            unwind_tables = dict()
         operations = {
             "join": join_tables,
             "parallelize": unwind_tables,
         }
         query = QueryPipeline(
             root_document=db.Schedule,
-            allow_disk_usage=True
+            allow_disk_usage=True,
+            cache=True
         )
         query = self._query_helper(
             query=query,
@@ -71,7 +97,25 @@ class Course:
         return query
 
     def record_look_up(
-            self
+            self,
+            fields: dict = None,
+            after: tuple = None,
+            limit: int = None
+    ) -> QueryPipeline:
+        return self._record_look_up(
+            course_id=self.id,
+            fields=fields,
+            after=after,
+            limit=limit
+        )
+
+    @classmethod
+    def _record_look_up(
+            cls,
+            course_id,
+            fields: dict = None,
+            after: tuple = None,
+            limit: int = None
     ) -> QueryPipeline:
         semester_doc_name = get_doc_name(db.Semester)
         course_doc_name = get_doc_name(db.Course)
@@ -89,62 +133,126 @@ class Course:
             2: ["instructor"],
         }
         match_conditions = {
-            1: [{"course._id": self.id}]
+            1: [{"course._id": course_id}]
         }
+        query = QueryPipeline(
+            root_document=db.Record,
+            allow_disk_usage=True,
+            cache=True
+        )
+        if fields is not None:
+            # Only the joins of the requested fields are done, and each of them
+            # carries only these fields, single references are unwound by the join.
+            join_tables = {
+                index: join + [fields[join[3]], index in unwind_tables]
+                for index, join in join_tables.items() if join[3] in fields
+            }
+            unwind_tables = dict()
+            match_conditions = dict()
+            query.match(
+                {"course": course_id}
+            )
+            if after is not None:
+                # Keyset pagination, records come after the given (semester, section).
+                semester, section = after
+                query.match({
+                    "$or": [
+                        {"semester": {"$lt": semester}},
+                        {"semester": semester, "section": {"$gt": section}}
+                    ]
+                })
+            query.sort(
+                {"semester": -1, "section": 1}
+            )
         operations = {
             "join": join_tables,
             "parallelize": unwind_tables,
             "match": match_conditions
         }
-        query = QueryPipeline(
-            root_document=db.Record,
-            allow_disk_usage=True
-        )
-        query = self._query_helper(
+        query = cls._query_helper(
             query=query,
             operations=operations,
             steps=4
-        ).sort(
-            {"semester._id": -1}
         )
+        if fields is None:
+            query.sort(
+                {"semester._id": -1}
+            )
+        elif limit:
+            # The page is limited after the joins, as the records whose references
+            # could not be joined are dropped by the unwinds.
+            query.limit(limit)
         return query
 
     # -------APPLICATION FUNCTIONS--------
     def get_course(
             self
     ) -> db.Course:
-        course = db.Course.objects(
-            id=self.id
-        ).first()
-        return course
+        course_data = self._find_course()
+        if course_data is None:
+            return None
+        return self._memoize(
+            ("course", "document"),
+            lambda: db.Course._from_son(course_data)
+        )
+
+    def _find_course(
+            self
+    ) -> dict:
+        return self._memoize(
+            ("course",),
+            lambda: db.Course._get_collection().find_one(
+                {"_id": self.id}
+            )
+        )
+
+    def get_course_data(
+            self
+    ) -> dict:
+        return self._find_course()
 
     def get_course_name(
             self
     ) -> str:
-        course = self.get_course()
-        if hasattr(course, "name"):
-            course = course.name
+        course = self._find_course()
+        if course is not None:
+            course = course.get("name")
         return course
 
     def get_course_df(
             self
     ):
-        course = self.get_course()
-        course_data = json.loads(
-            course.to_json()
-        )
-        data_frame = pd.Series(
-            data=course_data
-        ).to_frame(
-            name="course"
-        )
-        return data_frame
+        def load():
+            return pd.Series(
+                data=self._find_course()
+            ).to_frame(
+                name="course"
+            )
+        return self._memoize(("course", "df"), load)
 
     def get_records(
             self,
-            simplified: bool = True
+            simplified: bool = True,
+            after: tuple = None,
+            limit: int = None
+    ) -> QueryPipeline:
+        template = record_templates[(simplified, after is not None, bool(limit))]
+        params = {"course_id": self.id}
+        if after is not None:
+            params["after_semester"], params["after_section"] = after
+        if limit:
+            params["limit"] = limit
+        return template.bind(**params)
+
+    @classmethod
+    def _build_records(
+            cls,
+            course_id,
+            simplified: bool = True,
+            after: tuple = None,
+            limit: int = None,
+            batch: bool = False
     ) -> QueryPipeline:
-        query = self.record_look_up()
         if simplified:
             new_fields = {
                 "semesterId": "semester._id",
@@ -178,7 +286,21 @@ class Course:
                 "instructorName": "instructor.name",
                 "instructorTitle": "instructor.title"
             }
+        if batch and "courseId" not in new_fields:
+            # Records of many courses are grouped by the local course reference.
+            new_fields = {"courseId": "course", **new_fields}
 
+        joined_fields = dict()
+        for value in new_fields.values():
+            output_field, _, field = value.partition(".")
+            if field:
+                joined_fields.setdefault(output_field, list()).append(field)
+        query = cls._record_look_up(
+            course_id=course_id,
+            fields=joined_fields,
+            after=after,
+            limit=limit
+        )
         for key, value in new_fields.items():
             query.add_field(
                 key=key,
@@ -191,20 +313,91 @@ class Course:
         )
         return query
 
+    @classmethod
+    def get_many_records(
+            cls,
+            course_ids: list,
+            simplified: bool = True
+    ) -> dict:
+        """
+        Returns the records of many courses with a single aggregation, whose records
+        are grouped by their course ids, in the order of the given ids.
+
+        :param list course_ids: Ids of the courses.
+        :param bool simplified: Return the simplified fields of the records.
+        :return: Dictionary of the record lists keyed by the course ids.
+        """
+        if not main_conn.online:
+            main_conn.connect()
+        course_ids = list(dict.fromkeys(course_ids))
+        records = {course_id: list() for course_id in course_ids}
+        if len(course_ids) == 0:
+            return records
+
+        query = batch_templates[simplified].bind(
+            course_ids=course_ids
+        )
+        result = single_flight.do(
+            ("batch", query.fingerprint()),
+            query.run
+        )
+        for record in result:
+            records[record["courseId"]].append(record)
+        return records
+
+    def get_records_list(
+            self,
+            simplified: bool = True,
+            after: tuple = None,
+            limit: int = None
+    ) -> list:
+        return self._memoize(
+            ("records", simplified, after, limit),
+            lambda: self.get_records(
+                simplified=simplified,
+                after=after,
+                limit=limit
+            ).run()
+        )
+
     def get_records_df(
-            self
+            self,
+            after: tuple = None,
+            limit: int = None
     ) -> pd.DataFrame:
-        records = self.get_records().run()
-        data_frame = pd.DataFrame(
-            data=records
+        def load():
+            key = ("records", True, after, limit)
+            if key in self.identity_map:
+                return pd.DataFrame(
+                    data=self.identity_map[key]
+                )
+            return self.get_records(
+                after=after,
+                limit=limit
+            ).to_frame()
+        return self._memoize(("records", "df", after, limit), load)
+
+    def stream_records(
+            self,
+            simplified: bool = True,
+            after: tuple = None,
+            limit: int = None,
+            batch_size: int = None
+    ):
+        return self.get_records(
+            simplified=simplified,
+            after=after,
+            limit=limit
+        ).stream(
+            batch_size=batch_size
         )
-        return data_frame
 
     def get_all_course_ids(
             self
     ) -> list:
         query = QueryPipeline(
-            root_document=db.Course
+            root_document=db.Course,
+            cache=True
         ).group(
             main_field="_id"
         ).add_field(
@@ -219,6 +412,32 @@ class Course:
         return course_ids
 
 
+# Templates of the record pipelines, keyed by (simplified, paginated, limited). They are
+# built once, and only bound to the course id and the page of each request.
+record_templates = {
+    (simplified, paginated, limited): Course._build_records(
+        course_id=Parameter("course_id"),
+        simplified=simplified,
+        after=(Parameter("after_semester"), Parameter("after_section")) if paginated else None,
+        limit=Parameter("limit") if limited else None
+    ).compile()
+    for simplified in (True, False)
+    for paginated in (True, False)
+    for limited in (True, False)
+}
+
+
+# Templates of the record pipelines of many courses, keyed by simplified.
+batch_templates = {
+    simplified: Course._build_records(
+        course_id={"$in": Parameter("course_ids")},
+        simplified=simplified,
+        batch=True
+    ).compile()
+    for simplified in (True, False)
+}
+
+
 if __name__ == "__main__":
     api = Course(
         2360111
@@ -0,0 +1,98 @@
+import threading
+from bisect import bisect_left
+from src.utils import config
+from src.utils.Utils import Logger
+from src.mainAPI.courses.db.Connector import main_conn
+from src.mainAPI.courses.db.Version import version_tracker
+import src.mainAPI.courses.db.MongoDB as db
+
+
+# Define logger object.
+logger = Logger(__name__).get_course_logger()
+
+
+class CourseIndex:
+    """
+    CourseIndex keeps the course ids and names of the process in sorted arrays, so the
+    courses whose id, name or a word of the name starts with a prefix are found by
+    binary search. The index is built with the first search, and built again when an
+    ingestion bumps the data version.
+
+    """
+    def __init__(self, tracker=None):
+        self.tracker = tracker or version_tracker
+        self.version = None
+        self.keys = list()
+        self.positions = list()
+        self.courses = list()
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def build(self):
+        if not main_conn.online:
+            main_conn.connect()
+        version = self.tracker.current()
+        courses = list()
+        entries = list()
+        cursor = db.Course._get_collection().find(
+            {},
+            projection={"name": True}
+        ).sort("_id", 1)
+        for document in cursor:
+            name = document.get("name") or ""
+            position = len(courses)
+            courses.append((document["_id"], name))
+            keys = {str(document["_id"]), name.lower()}
+            keys.update(name.lower().split())
+            for key in keys:
+                if key:
+                    entries.append((key, position))
+        entries.sort()
+
+        with self.lock:
+            self.keys = [key for key, _ in entries]
+            self.positions = [position for _, position in entries]
+            self.courses = courses
+            self.version = version
+        logger.info(f"COURSE INDEX: {len(courses)} courses, {len(entries)} keys, VERSION: {version}.")
+        return self
+
+    def refresh(self):
+        if self.version is None or self.version != self.tracker.current():
+            with self.build_lock:
+                # The index could be built by another thread while waiting.
+                if self.version is None or self.version != self.tracker.current():
+                    self.build()
+        return self
+
+    def search(self, prefix: str, limit: int = None) -> list:
+        """
+        Finds the courses whose id, name or a word of the name starts with the prefix,
+        in the order of their keys.
+
+        :param str prefix: Prefix typed by the user, case insensitive.
+        :param int limit: Maximum number of courses, 'config.autocomplete_max_items' by default.
+        :return: List of (course id, course name) tuples.
+        """
+        self.refresh()
+        limit = limit or config.autocomplete_max_items
+        prefix = str(prefix).strip().lower()
+        if not prefix:
+            return list()
+
+        with self.lock:
+            keys, positions, courses = self.keys, self.positions, self.courses
+        found = list()
+        seen = set()
+        index = bisect_left(keys, prefix)
+        while index < len(keys) and keys[index].startswith(prefix) and len(found) < limit:
+            position = positions[index]
+            if position not in seen:
+                seen.add(position)
+                found.append(courses[position])
+            index += 1
+        return found
+
+
+# Shared course index of the process.
+course_index = CourseIndex()
@@ -0,0 +1,68 @@
+import copy
+import threading
+from src.utils import config
+from src.utils.Utils import Logger
+
+
+# Define logger object.
+logger = Logger(__name__).get_course_logger()
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    SingleFlight coalesces the concurrent calls of the same key. The first caller of a
+    key runs the function, and the callers coming while it is in flight wait for it
+    and share its result, or its error. A waiting caller runs the function itself if
+    the call is not finished in 'timeout' seconds. Waiting callers get deep copies of
+    the result, so a caller modifying its result does not change the others'.
+
+    """
+    def __init__(self, timeout: float = None):
+        if timeout is None:
+            timeout = config.single_flight_timeout
+        self.timeout = timeout
+        self.calls = dict()
+        self.lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, function):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if leader:
+            try:
+                call.result = function()
+            except Exception as err:
+                call.error = err
+                raise
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call.event.set()
+            return call.result
+
+        if not call.event.wait(self.timeout):
+            logger.warning(
+                f"In flight call of the key {key} is not finished in {self.timeout} seconds, "
+                f"it is called again."
+            )
+            return function()
+        if call.error is not None:
+            raise call.error
+        with self.lock:
+            self.shared += 1
+        return copy.deepcopy(call.result)
+
+
+# Shared single flight object of the process.
+single_flight = SingleFlight()
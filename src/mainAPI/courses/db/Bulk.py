@@ -0,0 +1,117 @@
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from src.utils.Utils import Logger, get_doc_name
+
+
+bulk_logger = Logger(__name__).get_parser_logger()
+
+
+# -----BULK WRITER CLASS------
+class BulkWriter:
+    """
+    BulkWriter collects new documents instead of saving them one by one, and
+    writes them to their collections with unordered batched 'insert_many' calls.
+    Documents without a primary key get an ObjectId when they are added, so other
+    documents can reference them before they are written.
+
+    Document classes given in 'upsert_keys' are not inserted, instead each of them
+    is written with an 'update_one(..., upsert=True)' operation filtered by its key
+    fields, so existing documents are updated in place.
+
+    """
+    def __init__(self, batch_size: int = 1000, upsert_keys: dict = None):
+        self.batch_size = batch_size
+        self.upsert_keys = upsert_keys or dict()
+
+        # Pending documents for each document class, upserted documents are
+        # kept by their keys so only the last version of a key is written.
+        self.pending = dict()
+
+        # Number of written documents for each collection.
+        self.counts = dict()
+
+    def is_upserted(self, doc_cls) -> bool:
+        return doc_cls in self.upsert_keys
+
+    def add(self, document):
+        document.validate()
+        doc_cls = type(document)
+        if self.is_upserted(doc_cls):
+            son = document.to_mongo()
+            key = tuple(son.get(field) for field in self.upsert_keys[doc_cls])
+            self.pending.setdefault(doc_cls, dict())[key] = document
+        else:
+            if document.pk is None:
+                document.pk = ObjectId()
+            self.pending.setdefault(doc_cls, list()).append(document)
+        if len(self.pending[doc_cls]) >= self.batch_size:
+            self.flush(doc_cls)
+        return document
+
+    def _upsert(self, doc_cls, documents: list) -> int:
+        collection = doc_cls._get_collection()
+        key_fields = self.upsert_keys[doc_cls]
+        operations = list()
+        for document in documents:
+            son = document.to_mongo()
+            son.pop("_id", None)
+            operations.append(
+                UpdateOne(
+                    {field: son.get(field) for field in key_fields},
+                    {"$set": son},
+                    upsert=True
+                )
+            )
+        try:
+            result = collection.bulk_write(
+                operations,
+                ordered=False
+            )
+        except BulkWriteError as err:
+            details = err.details
+            bulk_logger.error(
+                f"{len(details.get('writeErrors', list()))} documents could not be upserted "
+                f"to {get_doc_name(doc_cls)}: {details.get('writeErrors', list())[:1]}"
+            )
+            return details.get("nUpserted", 0) + details.get("nModified", 0)
+        return result.upserted_count + result.modified_count
+
+    def _write(self, doc_cls, documents: list) -> int:
+        if self.is_upserted(doc_cls):
+            return self._upsert(doc_cls, documents)
+        collection = doc_cls._get_collection()
+        try:
+            result = collection.insert_many(
+                [document.to_mongo() for document in documents],
+                ordered=False
+            )
+        except BulkWriteError as err:
+            details = err.details
+            bulk_logger.error(
+                f"{len(details.get('writeErrors', list()))} documents could not be written "
+                f"to {get_doc_name(doc_cls)}: {details.get('writeErrors', list())[:1]}"
+            )
+            return details.get("nInserted", 0)
+        return len(result.inserted_ids)
+
+    def flush(self, doc_cls=None):
+        if doc_cls is None:
+            doc_classes = list(self.pending.keys())
+        else:
+            doc_classes = [doc_cls]
+
+        for doc_cls in doc_classes:
+            documents = self.pending.pop(doc_cls, list())
+            if isinstance(documents, dict):
+                documents = list(documents.values())
+            if len(documents) == 0:
+                continue
+            doc_name = get_doc_name(doc_cls)
+            self.counts[doc_name] = self.counts.get(doc_name, 0) + self._write(
+                doc_cls, documents
+            )
+        return self
+
+    def total(self) -> int:
+        return sum(self.counts.values())
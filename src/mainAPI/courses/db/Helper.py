@@ -1,6 +1,6 @@
 from mongoengine import Q
 import time
-from src.utils.Utils import Logger, semester_id, schedule_index
+from src.utils.Utils import Logger, semester_id, schedule_index, schedule_features, schedule_slots_key
 from src.mainAPI.courses.db.Connector import main_conn
 from src.mainAPI.courses.db import MongoDB as db
 
@@ -8,8 +8,86 @@ from src.mainAPI.courses.db import MongoDB as db
 saver_logger = Logger(__name__).get_saver_logger()
 
 
+# -----DIMENSION CACHE------
+class DimensionCache:
+    """
+    DimensionCache keeps the dimension documents (semesters, courses, instructors,
+    classes, times, days and schedules) and the records that are already resolved
+    during an ingestion, keyed by the natural key of each document class. Once a dimension is found or
+    saved, further rows referring to it are resolved with a dictionary look up
+    instead of a query to the database.
+
+    """
+    def __init__(self):
+        self.documents = dict()
+        # Document classes whose collection is fully loaded into the cache,
+        # a miss for these classes means that the document does not exist.
+        self.complete = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, doc_cls, key) -> tuple:
+        try:
+            doc = self.documents[doc_cls][key]
+        except KeyError:
+            if doc_cls in self.complete:
+                self.hits += 1
+                return True, None
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, doc
+
+    def set(self, doc_cls, key, doc):
+        if doc is not None:
+            self.documents.setdefault(doc_cls, dict())[key] = doc
+        return self
+
+    def preload(self, doc_cls, key_fields: tuple, conditions: dict = None):
+        collection = doc_cls._get_collection()
+        for son in collection.find(conditions or dict()):
+            key = tuple(son.get(field) for field in key_fields)
+            if len(key) == 1:
+                key = key[0]
+            self.set(doc_cls, key, doc_cls._from_son(son))
+        self.complete.add(doc_cls)
+        return self
+
+    def size(self) -> int:
+        return sum(len(docs) for docs in self.documents.values())
+
+    def clear(self):
+        self.documents = dict()
+        self.complete = set()
+        self.hits = 0
+        self.misses = 0
+        return self
+
+
+# Shared cache object for all Feed subclasses, ingestion runs are responsible
+# for clearing it when they are done.
+dimension_cache = DimensionCache()
+
+# Natural keys of the documents in terms of stored field names, they must
+# match the '_cache_key' definitions of the related Feed subclasses.
+dimension_keys = {
+    db.Semester: ("_id",),
+    db.Course: ("_id",),
+    db.Instructor: ("name", "title"),
+    db.Class: ("building", "room"),
+    db.Time: ("start", "end"),
+    db.Day: ("_id",),
+    db.Schedule: ("courseDay", "courseTime", "courseClass"),
+}
+record_keys = ("semester", "course", "section")
+
+
 # -----MAIN FEED CLASS------
 class Feed:
+    # Optional bulk writer, if it is defined new documents are handed to it
+    # instead of being saved one by one.
+    writer = None
+
     def __init__(self, data: dict = None, document_class=None):
         # Define each of these above variables.
         self._define_connection()
@@ -79,17 +157,46 @@ class Feed:
         self.data = data
         return self
 
+    def _cache_key(self):
+        # Natural key of the document, subclasses without a key are not cached.
+        return None
+
+    def _find_doc(self):
+        return None
+
+    def _find_candidate(self):
+        key = self._cache_key()
+        if key is None:
+            return self._find_doc()
+        found, doc = dimension_cache.get(self.doc_cls, key)
+        if not found:
+            doc = self._find_doc()
+            dimension_cache.set(self.doc_cls, key, doc)
+        return doc
+
     def get(self):
         if not self.valid_data:
             return None
         elif self.candidate_obj is not None:
             return self.candidate_obj
         else:
-            result = self.doc_cls(
+            document = self.doc_cls(
                 **self.data
-            ).save()
+            )
+            if self.writer is None:
+                result = document.save()
+            else:
+                result = self.writer.add(document)
+            key = self._cache_key()
+            if key is not None:
+                dimension_cache.set(self.doc_cls, key, result)
             return result
 
+    @classmethod
+    def set_writer(cls, writer=None):
+        Feed.writer = writer
+        return cls
+
 
 # -----SUBCLASSES------
 class Semester(Feed):
@@ -114,7 +221,11 @@ class Semester(Feed):
                     "Semester": "name"
                 }
             )
-            self.candidate_obj = self._find_doc()
+            self.candidate_obj = self._find_candidate()
+
+    def _cache_key(self):
+        if self.valid_data:
+            return self.id
 
     def _find_doc(self):
         if self.valid_data:
@@ -144,7 +255,11 @@ class Program(Feed):
                     "Program Long Name": "longName"
                 }
             )
-            self.candidate_obj = self._find_doc()
+            self.candidate_obj = self._find_candidate()
+
+    def _cache_key(self):
+        if self.valid_data:
+            return self.id
 
     def _find_doc(self):
         if self.valid_data:
@@ -182,7 +297,11 @@ class Course(Feed):
                     "Application Credit": "creditApplication",
                 }
             )
-            self.candidate_obj = self._find_doc()
+            self.candidate_obj = self._find_candidate()
+
+    def _cache_key(self):
+        if self.valid_data:
+            return self.id
 
     def _find_doc(self):
         if self.valid_data:
@@ -212,7 +331,11 @@ class Instructor(Feed):
                     "Instructor Title": "title"
                 }
             )
-            self.candidate_obj = self._find_doc()
+            self.candidate_obj = self._find_candidate()
+
+    def _cache_key(self):
+        if self.valid_data:
+            return self.name, self.title
 
     def _find_doc(self):
         if self.valid_data:
@@ -242,7 +365,11 @@ class Class(Feed):
                     "Classroom": "room"
                 }
             )
-            self.candidate_obj = self._find_doc()
+            self.candidate_obj = self._find_candidate()
+
+    def _cache_key(self):
+        if self.valid_data:
+            return self.building, self.room
 
     def _find_doc(self):
         if self.valid_data:
@@ -272,7 +399,11 @@ class Time(Feed):
                     "End Hour": "end"
                 }
             )
-            self.candidate_obj = self._find_doc()
+            self.candidate_obj = self._find_candidate()
+
+    def _cache_key(self):
+        if self.valid_data:
+            return self.start, self.end
 
     def _find_doc(self):
         if self.valid_data:
@@ -296,7 +427,7 @@ class Day(Feed):
             )
             self.valid_data = False
         else:
-            self.candidate_obj = self._find_doc()
+            self.candidate_obj = self._find_candidate()
 
         if self.candidate_obj is None:
             self._rename(
@@ -305,6 +436,10 @@ class Day(Feed):
                 }
             )
 
+    def _cache_key(self):
+        if self.valid_data:
+            return self.id
+
     def _find_doc(self):
         if self.valid_data:
             day_doc = self.doc_cls.objects(
@@ -333,7 +468,7 @@ class Schedule(Feed):
             function="_define_time",
             defining_obj="Time"
         )
-        self.candidate_obj = self._find_doc()
+        self.candidate_obj = self._find_candidate()
 
         if self.candidate_obj is None:
             self._rename(
@@ -344,6 +479,14 @@ class Schedule(Feed):
                 }
             )
 
+    def _cache_key(self):
+        if self.valid_data:
+            return (
+                getattr(self.course_day, "pk", None),
+                getattr(self.course_time, "pk", None),
+                getattr(self.course_class, "pk", None)
+            )
+
     def _find_doc(self):
         if self.valid_data:
             schedule_doc = self.doc_cls.objects(
@@ -381,10 +524,12 @@ class Schedule(Feed):
 
 # -----RECORD CLASS------
 class Record(Feed):
-    def __init__(self, data: dict):
+    def __init__(self, data: dict, upsert: bool = None):
         super().__init__(
             data, db.Record
         )
+        # Existing record which is replaced by the record of this row.
+        self.replaced_obj = None
         self._run_definer(
             function="_define_semester",
             defining_obj="Semester"
@@ -403,7 +548,18 @@ class Record(Feed):
             )
             self.valid_data = False
         else:
-            self.candidate_obj = self._find_doc()
+            upserted = self.writer is not None and self.writer.is_upserted(self.doc_cls)
+            if upsert is None:
+                upsert = upserted
+            if upsert and upserted:
+                # Upserted records are written whether they exist or not.
+                self.candidate_obj = None
+            elif upsert:
+                # Without a bulk writer, the existing record is replaced by keeping its id.
+                self.replaced_obj = self._find_candidate()
+                self.candidate_obj = None
+            else:
+                self.candidate_obj = self._find_candidate()
 
         if self.candidate_obj is None:
             self._run_definer(
@@ -428,6 +584,19 @@ class Record(Feed):
                 }
             )
 
+    def _cache_key(self):
+        if self.valid_data:
+            return (
+                getattr(self.semester, "pk", None),
+                getattr(self.course, "pk", None),
+                self.section
+            )
+
+    def get(self):
+        if self.valid_data and self.replaced_obj is not None:
+            self.data["id"] = self.replaced_obj.pk
+        return super().get()
+
     def _find_doc(self):
         if self.valid_data:
             record_doc = self.doc_cls.objects(
@@ -453,35 +622,31 @@ class Record(Feed):
             self.data["course"] = course_obj
         return self
 
+    @staticmethod
+    def split_schedule(data: dict) -> list:
+        # Slots normalised while loading the sheet are used as they are.
+        if schedule_slots_key in data:
+            return [dict(slot) for slot in data[schedule_slots_key]]
+        schedule = dict()
+        for key, value in data.items():
+            if value is None:
+                continue
+            for column in schedule_features:
+                if column in key:
+                    index = schedule_index(key, column)
+                    schedule.setdefault(index, dict())[column] = value
+                    break
+        return [schedule[index] for index in sorted(schedule)]
+
     def _define_schedule(self):
         if self.valid_data:
-            max_schedule = 6
-            schedule = list()
-            for _ in range(max_schedule):
-                schedule.append(dict())
-            features = [
-                "Day",
-                "Start Hour",
-                "End Hour",
-                "Classroom Building",
-                "Classroom"
-            ]
-            for key, value in self.data.items():
-                if value is None:
-                    continue
-                for column in features:
-                    if column in key:
-                        index = schedule_index(key, column)
-                        schedule[index][column] = value
-                        break
             schedule_objs = list()
-            for data in schedule:
-                if len(data) != 0:
-                    schedule_objs.append(
-                        Schedule(
-                            schedule_data=data
-                        ).get()
-                    )
+            for data in self.split_schedule(self.data):
+                schedule_objs.append(
+                    Schedule(
+                        schedule_data=data
+                    ).get()
+                )
             self.data["schedule"] = schedule_objs
         return self
 
@@ -492,3 +657,13 @@ class Record(Feed):
             ).get()
             self.data["instructor"] = instructor_obj
         return self
+
+
+# -----HELPER FUNCTIONS------
+def define_dimensions(data: dict):
+    # Finds or creates every dimension document of a row without its record.
+    Semester(semester_data=dict(data)).get()
+    Course(course_data=dict(data)).get()
+    Instructor(instructor_data=dict(data)).get()
+    for schedule_data in Record.split_schedule(data):
+        Schedule(schedule_data=schedule_data).get()
@@ -0,0 +1,85 @@
+from pymongo.errors import OperationFailure
+from src.utils.Utils import Logger, get_doc_name
+from src.mainAPI.courses.db.Connector import main_conn
+from src.mainAPI.courses.db import MongoDB as db
+
+
+index_logger = Logger(__name__).get_query_logger()
+
+# Documents whose indexes are maintained by the application.
+indexed_documents = [
+    db.Semester,
+    db.Program,
+    db.Course,
+    db.Instructor,
+    db.Class,
+    db.Time,
+    db.Day,
+    db.Schedule,
+    db.Record,
+    db.Manifest,
+    db.ManifestRow,
+]
+
+
+def ensure_indexes() -> list:
+    """
+    The function creates the indexes declared in the 'meta' of each document class,
+    if they do not exist yet. Unique indexes could not be created on collections that
+    already contain duplicated keys, such collections are logged and skipped.
+
+    The documents do not create their indexes when they are first used, as the
+    application reads with a read only user. Indexes are ensured by the ingestion
+    before writing, or by running this module as a deploy step.
+
+    :return: Names of the documents whose indexes could not be created.
+    """
+    main_conn.connect()
+    failed = list()
+    for doc_cls in indexed_documents:
+        doc_name = get_doc_name(doc_cls)
+        try:
+            doc_cls.ensure_indexes()
+        except OperationFailure as err:
+            index_logger.error(
+                f"Indexes of {doc_name} could not be created: {err}"
+            )
+            failed.append(doc_name)
+        else:
+            index_logger.info(
+                f"Indexes of {doc_name} are ensured."
+            )
+    return failed
+
+
+def index_usage() -> list:
+    """
+    The function returns the usage statistics of every index of the maintained
+    documents, by using the '$indexStats' aggregation stage.
+
+    :return: List of dictionaries with collection, index name, key, number of operations and start time.
+    """
+    main_conn.connect()
+    usage = list()
+    for doc_cls in indexed_documents:
+        collection = doc_cls._get_collection()
+        for stats in collection.aggregate([{"$indexStats": {}}]):
+            usage.append({
+                "collection": collection.name,
+                "name": stats.get("name"),
+                "key": dict(stats.get("key", dict())),
+                "ops": stats.get("accesses", dict()).get("ops", 0),
+                "since": stats.get("accesses", dict()).get("since"),
+            })
+    return usage
+
+
+if __name__ == "__main__":
+    ensure_indexes()
+    for index_stats in index_usage():
+        print(
+            f"{index_stats['collection']:<12} "
+            f"{index_stats['name']:<40} "
+            f"ops={index_stats['ops']:<10} "
+            f"since={index_stats['since']}"
+        )
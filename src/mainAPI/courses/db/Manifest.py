@@ -0,0 +1,152 @@
+import datetime
+import hashlib
+import json
+import os
+from pymongo import DeleteMany, UpdateOne
+from src.utils.Utils import Logger, semester_id, schedule_slots_key
+from src.mainAPI.courses.db.Connector import main_conn
+from src.mainAPI.courses.db import MongoDB as db
+
+
+manifest_logger = Logger(__name__).get_parser_logger()
+
+# Number of row hashes written with a single bulk write.
+row_batch_size = 1000
+
+
+# -----INGESTION MANIFEST CLASS------
+class IngestionManifest:
+    """
+    IngestionManifest keeps the content hash, the row count and the semesters of an
+    ingested source file, together with the content hash of each of its rows keyed by
+    (semester, course, section). Row hashes are kept in their own collection, as the
+    rows of a large file do not fit in a single document. Unchanged files are skipped
+    with a single look up of the manifest document, and for the changed files only
+    the rows whose key or content differs from the previous ingestion are passed to
+    the parser. Keys of the rows whose content differs are kept, so the parser updates
+    their records.
+
+    """
+    def __init__(self, file_path: str):
+        main_conn.connect()
+        self.file_path = file_path
+        self.file = os.path.basename(file_path)
+        self.hash = self.file_hash(file_path)
+        self.document = db.Manifest.objects(
+            file=self.file
+        ).first()
+
+        # Row hashes of the previous ingestion, read with the first filtered rows.
+        self.previous_rows = None
+
+        # Row hashes and semesters of the current ingestion.
+        self.rows = dict()
+        self.updated_keys = set()
+        self.semesters = set()
+        self.row_count = 0
+        self.changed_count = 0
+
+    @staticmethod
+    def file_hash(file_path: str, block_size: int = 1 << 20) -> str:
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(block_size), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    @staticmethod
+    def row_key(data: dict) -> str:
+        semester = data.get("Semester")
+        if semester:
+            semester = semester_id(semester_name=semester)
+        return f"{semester}:{data.get('Course Code')}:{data.get('Course Section')}"
+
+    @staticmethod
+    def row_hash(data: dict) -> str:
+        content = json.dumps(
+            {key: value for key, value in data.items() if key != schedule_slots_key},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def is_unchanged(self) -> bool:
+        return self.document is not None and self.document.hash == self.hash
+
+    def _read_previous_rows(self) -> dict:
+        if self.previous_rows is None:
+            cursor = db.ManifestRow._get_collection().find(
+                {"file": self.file},
+                projection={"_id": False, "key": True, "hash": True}
+            )
+            self.previous_rows = {document["key"]: document["hash"] for document in cursor}
+        return self.previous_rows
+
+    def filter(self, rows):
+        # Yields the rows which are new or changed since the previous ingestion.
+        previous_rows = self._read_previous_rows()
+        for data in rows:
+            key = self.row_key(data)
+            row_hash = self.row_hash(data)
+            self.rows[key] = row_hash
+            self.row_count += 1
+            if data.get("Semester"):
+                self.semesters.add(
+                    semester_id(semester_name=data["Semester"])
+                )
+            previous_hash = previous_rows.get(key)
+            if previous_hash != row_hash:
+                self.changed_count += 1
+                if previous_hash is not None:
+                    self.updated_keys.add(key)
+                yield data
+
+    def is_updated(self, data: dict) -> bool:
+        # Whether the row is ingested before with a different content.
+        return self.row_key(data) in self.updated_keys
+
+    def _save_rows(self):
+        # Only the new and changed row hashes are written, and the ones of the rows
+        # which are not in the file anymore are removed.
+        previous_rows = self._read_previous_rows()
+        operations = [
+            UpdateOne(
+                {"file": self.file, "key": key},
+                {"$set": {"hash": row_hash}},
+                upsert=True
+            )
+            for key, row_hash in self.rows.items() if previous_rows.get(key) != row_hash
+        ]
+        removed_keys = [key for key in previous_rows if key not in self.rows]
+        for index in range(0, len(removed_keys), row_batch_size):
+            operations.append(
+                DeleteMany({"file": self.file, "key": {"$in": removed_keys[index:index + row_batch_size]}})
+            )
+        collection = db.ManifestRow._get_collection()
+        for index in range(0, len(operations), row_batch_size):
+            collection.bulk_write(
+                operations[index:index + row_batch_size],
+                ordered=False
+            )
+        self.previous_rows = dict(self.rows)
+        return self
+
+    def save(self):
+        # The manifest document is written after the row hashes, so a file is never
+        # skipped with missing row hashes.
+        self._save_rows()
+        db.Manifest(
+            file=self.file,
+            hash=self.hash,
+            rowCount=self.row_count,
+            semesters=sorted(
+                semester for semester in self.semesters if semester is not None
+            ),
+            updated=datetime.datetime.utcnow()
+        ).save()
+        manifest_logger.info(
+            f"Manifest is saved for {self.file}: {self.row_count} rows, "
+            f"{self.changed_count} new or changed rows, "
+            f"{len(self.updated_keys)} of them are updated."
+        )
+        return self
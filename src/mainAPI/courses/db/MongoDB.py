@@ -30,16 +30,37 @@ class Instructor(Document):
     name = StringField(max_length=200)
     title = StringField(max_length=200)
 
+    meta = {
+        "auto_create_index": False,
+        "indexes": [
+            {"fields": ["name", "title"], "unique": True}
+        ]
+    }
+
 
 class Class(Document):
     building = StringField(max_length=200)
     room = StringField(max_length=200)
 
+    meta = {
+        "auto_create_index": False,
+        "indexes": [
+            {"fields": ["building", "room"], "unique": True}
+        ]
+    }
+
 
 class Time(Document):
     start = StringField(max_length=10)
     end = StringField(max_length=10)
 
+    meta = {
+        "auto_create_index": False,
+        "indexes": [
+            {"fields": ["start", "end"], "unique": True}
+        ]
+    }
+
 
 class Day(Document):
     day = StringField(primary_key=True)
@@ -50,6 +71,13 @@ class Schedule(Document):
     courseTime = ReferenceField(Time)
     courseDay = ReferenceField(Day)
 
+    meta = {
+        "auto_create_index": False,
+        "indexes": [
+            {"fields": ["courseDay", "courseTime", "courseClass"], "unique": True}
+        ]
+    }
+
 
 class Record(Document):
     semester = ReferenceField(Semester)
@@ -62,3 +90,42 @@ class Record(Document):
     schedule = ListField(ReferenceField(Schedule))
     instructor = ReferenceField(Instructor)
 
+    meta = {
+        "auto_create_index": False,
+        "indexes": [
+            {"fields": ["semester", "course", "section"], "unique": True},
+            {"fields": ["course", "-semester", "section"]}
+        ]
+    }
+
+
+class Manifest(Document):
+    file = StringField(primary_key=True, max_length=500)
+    hash = StringField(max_length=64)
+    rowCount = IntField()
+    semesters = ListField(IntField())
+    updated = DateTimeField()
+
+    meta = {
+        # Manifests written before the row hashes are moved out keep them in 'rows'.
+        "strict": False
+    }
+
+
+class ManifestRow(Document):
+    file = StringField(max_length=500)
+    key = StringField(max_length=200)
+    hash = StringField(max_length=40)
+
+    meta = {
+        "auto_create_index": False,
+        "indexes": [
+            {"fields": ["file", "key"], "unique": True}
+        ]
+    }
+
+
+class DataVersion(Document):
+    id = StringField(primary_key=True, max_length=200)
+    version = IntField(default=0)
+    updated = DateTimeField()
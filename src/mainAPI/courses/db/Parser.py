@@ -1,12 +1,35 @@
+import datetime
+import glob
 import json
+import multiprocessing
+import os
 import pandas as pd
 import time
-from src.mainAPI.courses.db.Helper import Record
-from src.utils.Utils import Logger, get_src_path
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import load_workbook
+from src.mainAPI.courses.db.Bulk import BulkWriter
+from src.mainAPI.courses.db.Connector import main_conn
+from src.mainAPI.courses.db.Indexes import ensure_indexes
+from src.mainAPI.courses.db.Manifest import IngestionManifest
+from src.mainAPI.courses.db.Version import bump_version, course_key
+from src.mainAPI.courses.db.Helper import Feed, Record, dimension_cache, dimension_keys, record_keys, \
+    define_dimensions
+from src.mainAPI.courses.db import MongoDB as db
+from src.utils.Utils import Logger, get_src_path, semester_id, schedule_table, attach_schedule_slots, \
+    schedule_slots_key
 
 
 default_path = get_src_path("\\data\\")
 default_file = "SearchResults.xlsx"
+default_pattern = "SearchResults*.xlsx"
+default_chunk_size = 1000
+record_columns = [
+    "Course Section",
+    "Capacity",
+    "Exchange Capacity",
+    "Exchange Used Capacity",
+    "Course Status"
+]
 parser_logger = Logger(__name__).get_parser_logger()
 
 
@@ -18,6 +41,9 @@ class Parser:
         self.file = None
         self.path = None
         self.load_flag = False
+        self.stream_flag = False
+        self.chunk_size = default_chunk_size
+        self.manifest = None
 
     def _load_json(self):
         if not self.load_flag:
@@ -26,16 +52,133 @@ class Parser:
             index=False,
             orient="table"
         )
-        self.data = json.loads(data)["data"]
+        # Whole numbers of the float columns are converted back to integers, and the
+        # schedule is built from the converted rows, so the rows are the same with
+        # the ones of the streaming mode.
+        self.data = self._attach_schedule([
+            {column: self._convert_cell(value) for column, value in row.items()}
+            for row in json.loads(data)["data"]
+        ])
         return self
 
+    @staticmethod
+    def _convert_cell(value):
+        # Converts the cell values as the JSON round trip of DataFrame would do. Dates
+        # are written in milliseconds without time zone, times in ISO format. The whole
+        # numbers are kept as integers, as the JSON round trip writes them as floats
+        # only when their column has an empty cell.
+        if isinstance(value, datetime.datetime):
+            return value.isoformat(timespec="milliseconds")
+        if isinstance(value, datetime.date):
+            return datetime.datetime.combine(value, datetime.time()).isoformat(timespec="milliseconds")
+        if isinstance(value, datetime.time):
+            return value.isoformat()
+        if isinstance(value, float):
+            if value != value:
+                return None
+            if value.is_integer():
+                return int(value)
+        return value
+
+    @staticmethod
+    def _attach_schedule(chunk: list) -> list:
+        return attach_schedule_slots(
+            rows=chunk,
+            table=schedule_table(pd.DataFrame(chunk, dtype=object))
+        )
+
+    def _stream_chunks(self):
+        workbook = load_workbook(
+            filename=self.path + self.file,
+            read_only=True,
+            data_only=True
+        )
+        try:
+            # The first sheet is read, as pandas does, whichever sheet is active.
+            rows = workbook.worksheets[0].iter_rows(
+                values_only=True
+            )
+            header = next(rows, None)
+            if header is None:
+                return
+            chunk = list()
+            for values in rows:
+                chunk.append({
+                    column: self._convert_cell(value)
+                    for column, value in zip(header, values)
+                    if column is not None
+                })
+                if len(chunk) >= self.chunk_size:
+                    yield self._attach_schedule(chunk)
+                    chunk = list()
+            if len(chunk) != 0:
+                yield self._attach_schedule(chunk)
+        finally:
+            workbook.close()
+
+    def _stream_rows(self):
+        for chunk in self._stream_chunks():
+            for data in chunk:
+                yield data
+
+    def _chunks(self, chunk_size: int):
+        if self.stream_flag:
+            self.chunk_size = chunk_size
+            for chunk in self._stream_chunks():
+                yield chunk
+        elif isinstance(self.data, list):
+            for index in range(0, len(self.data), chunk_size):
+                yield self.data[index:index + chunk_size]
+
+    def chunks(self, chunk_size: int = None):
+        chunk_size = chunk_size or self.chunk_size
+        for chunk in self._chunks(chunk_size):
+            if self.manifest is not None:
+                chunk = list(self.manifest.filter(chunk))
+            if len(chunk) != 0:
+                yield chunk
+
+    def rows(self):
+        if self.manifest is not None:
+            return self.manifest.filter(self.data)
+        return self.data
+
     def load(
             self,
             file: str = None,
-            path: str = None
+            path: str = None,
+            stream: bool = False,
+            chunk_size: int = None,
+            incremental: bool = False
     ):
         self.file = file or default_file
         self.path = path or default_path
+        self.stream_flag = stream
+        self.chunk_size = chunk_size or default_chunk_size
+        self.manifest = None
+        if incremental and os.path.isfile(self.path + self.file):
+            self.manifest = IngestionManifest(
+                file_path=self.path + self.file
+            )
+            if self.manifest.is_unchanged():
+                parser_logger.info(
+                    f"Following file is not changed since its last ingestion, skipped: {self.file}"
+                )
+                self.manifest = None
+                self.load_flag = False
+                return self
+        if stream:
+            if not os.path.isfile(self.path + self.file):
+                parser_logger.error(
+                    f"While reading data following error occurred: "
+                    f"File could not be found: {self.path + self.file}"
+                )
+                self.load_flag = False
+                return self
+            # Rows are read lazily from the workbook while parsing.
+            self.data = self._stream_rows()
+            self.load_flag = True
+            return self
         try:
             self.data_df = pd.read_excel(
                 io=self.path + self.file
@@ -52,35 +195,269 @@ class Parser:
         else:
             return self._load_json()
 
-    def parse(self):
-        if self.load_flag:
-            if isinstance(self.data, list):
-                tick = time.time()
-                for data in self.data:
-                    Record(
-                        data=data
-                    ).get()
-                tock = time.time()
-                parser_logger.info(
-                    f"Following file successfully parsed: {self.file}. "
-                    f"Total time it takes: {tock - tick}"
+    def _preload(self):
+        main_conn.connect()
+        for doc_cls, key_fields in dimension_keys.items():
+            dimension_cache.preload(
+                doc_cls=doc_cls,
+                key_fields=key_fields
+            )
+        return self
+
+    @staticmethod
+    def _preload_records(data: list, loaded_semesters: set):
+        semester_ids = set()
+        for row in data:
+            if row.get("Semester"):
+                semester_ids.add(
+                    semester_id(semester_name=row["Semester"])
+                )
+        semester_ids -= loaded_semesters
+        if len(semester_ids) != 0:
+            dimension_cache.preload(
+                doc_cls=db.Record,
+                key_fields=record_keys,
+                conditions={"semester": {"$in": list(semester_ids)}}
+            )
+            loaded_semesters.update(semester_ids)
+        return loaded_semesters
+
+    def _is_updated(self, data: dict) -> bool:
+        # Rows whose content is changed since the previous ingestion replace their records.
+        return self.manifest is not None and self.manifest.is_updated(data)
+
+    def parse_bulk(self, batch_size: int = 1000, upsert: bool = False):
+        if self.load_flag and self.data is not None:
+            ensure_indexes()
+            dimension_cache.clear()
+            upsert_keys = None
+            if upsert or self.manifest is not None:
+                # Changed rows of an incremental ingestion update their records.
+                upsert_keys = {db.Record: record_keys}
+            writer = BulkWriter(
+                batch_size=batch_size,
+                upsert_keys=upsert_keys
+            )
+            tick = time.time()
+            self._preload()
+            loaded_semesters = set()
+            touched_courses = set()
+            row_count = 0
+            Feed.set_writer(writer)
+            try:
+                for chunk in self.chunks(batch_size):
+                    if not upsert:
+                        self._preload_records(chunk, loaded_semesters)
+                    for data in chunk:
+                        touched_courses.add(data.get("Course Code"))
+                        Record(
+                            data=data,
+                            upsert=upsert or self._is_updated(data)
+                        ).get()
+                    row_count += len(chunk)
+                writer.flush()
+            finally:
+                Feed.set_writer(None)
+            if self.manifest is not None:
+                self.manifest.save()
+            if writer.total() > 0:
+                bump_version(
+                    keys=[course_key(course_id) for course_id in touched_courses if course_id is not None]
+                )
+            tock = time.time()
+            total_time = tock - tick
+            rate = row_count / total_time if total_time > 0 else 0
+            parser_logger.info(
+                f"Following file successfully parsed in bulk: {self.file}. "
+                f"Total time it takes: {total_time}, "
+                f"rows/second: {rate:.1f}, "
+                f"written documents: {writer.counts}"
+            )
+            dimension_cache.clear()
+        return self
+
+    def parse(self, bulk: bool = False, batch_size: int = 1000, upsert: bool = False):
+        if bulk or upsert:
+            return self.parse_bulk(
+                batch_size=batch_size,
+                upsert=upsert
+            )
+        if self.load_flag and self.data is not None:
+            ensure_indexes()
+            dimension_cache.clear()
+            tick = time.time()
+            row_count = 0
+            touched_courses = set()
+            for data in self.rows():
+                touched_courses.add(data.get("Course Code"))
+                Record(
+                    data=data,
+                    upsert=self._is_updated(data)
+                ).get()
+                row_count += 1
+            if self.manifest is not None:
+                self.manifest.save()
+            if row_count > 0:
+                bump_version(
+                    keys=[course_key(course_id) for course_id in touched_courses if course_id is not None]
                 )
+            tock = time.time()
+            parser_logger.info(
+                f"Following file successfully parsed: {self.file}. "
+                f"Total time it takes: {tock - tick}"
+            )
+            parser_logger.info(
+                f"Dimension cache: {dimension_cache.size()} documents, "
+                f"{dimension_cache.hits} hits, "
+                f"{dimension_cache.misses} misses."
+            )
+            dimension_cache.clear()
         return self
 
 
+# -----MULTI FILE INGESTION------
+def _split_file_path(file_path: str) -> tuple:
+    path, file = os.path.split(file_path)
+    return file, path + os.sep
+
+
+def _collect_dimensions(file_path: str) -> list:
+    # Reads a file and returns its rows without the record columns, only the
+    # distinct ones are kept as they define the same dimension documents.
+    file, path = _split_file_path(file_path)
+    parser = Parser().load(
+        file=file,
+        path=path,
+        stream=True
+    )
+    rows = dict()
+    if parser.load_flag:
+        for data in parser.data:
+            row = {
+                key: value for key, value in data.items()
+                if key not in record_columns and key != schedule_slots_key
+            }
+            rows[tuple(sorted(row.items()))] = row
+    return list(rows.values())
+
+
+def _ingest_file(file_path: str, batch_size: int, incremental: bool, upsert: bool) -> str:
+    file, path = _split_file_path(file_path)
+    Parser().load(
+        file=file,
+        path=path,
+        stream=True,
+        incremental=incremental
+    ).parse_bulk(
+        batch_size=batch_size,
+        upsert=upsert
+    )
+    return file_path
+
+
+def _connect_worker():
+    main_conn.connect()
+
+
+def parse_files(
+        pattern: str = None,
+        workers: int = None,
+        batch_size: int = 1000,
+        incremental: bool = False,
+        upsert: bool = False
+) -> list:
+    """
+    Ingests all spreadsheet files matching the given glob pattern, or all of the
+    spreadsheets in the given directory, with a pool of worker processes.
+
+    The dimension documents are merged in this process first, so every worker
+    finds them in its preloaded cache and only writes records. Hence, two workers
+    never create the same semester, course, instructor, class, time, day or schedule.
+
+    :param str pattern: Glob pattern of the files or a directory.
+    :param int workers: Number of worker processes, default is the number of cores.
+    :param int batch_size: Batch size of the bulk writes of each worker.
+    :param bool incremental: Skip the unchanged files and rows by using the ingestion manifest.
+    :param bool upsert: Update the existing records instead of keeping them as they are.
+    :return: List of ingested files.
+    """
+    pattern = pattern or default_path + default_pattern
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.xlsx")
+    files = sorted(glob.glob(pattern))
+    if len(files) == 0:
+        parser_logger.error(
+            f"No file could be found for the pattern: {pattern}"
+        )
+        return files
+
+    if incremental:
+        main_conn.connect()
+        changed_files = list()
+        for file_path in files:
+            if IngestionManifest(file_path=file_path).is_unchanged():
+                parser_logger.info(
+                    f"Following file is not changed since its last ingestion, skipped: {file_path}"
+                )
+            else:
+                changed_files.append(file_path)
+        files = changed_files
+        if len(files) == 0:
+            return files
+
+    tick = time.time()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_connect_worker
+    ) as executor:
+        rows = dict()
+        for file_rows in executor.map(_collect_dimensions, files):
+            for row in file_rows:
+                rows[tuple(sorted(row.items()))] = row
+
+        main_conn.connect()
+        ensure_indexes()
+        dimension_cache.clear()
+        for doc_cls, key_fields in dimension_keys.items():
+            dimension_cache.preload(
+                doc_cls=doc_cls,
+                key_fields=key_fields
+            )
+        writer = BulkWriter(
+            batch_size=batch_size
+        )
+        Feed.set_writer(writer)
+        try:
+            for row in rows.values():
+                define_dimensions(row)
+            writer.flush()
+        finally:
+            Feed.set_writer(None)
+            dimension_cache.clear()
+        parser_logger.info(
+            f"Dimensions of {len(files)} files are merged, "
+            f"written documents: {writer.counts}"
+        )
+
+        ingested = list(
+            executor.map(
+                _ingest_file,
+                files,
+                [batch_size] * len(files),
+                [incremental] * len(files),
+                [upsert] * len(files)
+            )
+        )
+
+    tock = time.time()
+    parser_logger.info(
+        f"{len(ingested)} files are ingested in parallel. "
+        f"Total time it takes: {tock - tick}"
+    )
+    return ingested
+
+
 if __name__ == "__main__":
-    def saver(index: int = None):
-        file_name = "SearchResults "
-        if index is None:
-            file_index = ""
-        else:
-            file_index = f"({index})"
-        file_tag = ".xlsx"
-        file = file_name + file_index + file_tag
-        Parser().load(
-            file=file
-        ).parse()
-    for i in range(6, 29):
-        print("START: ", i)
-        saver(i)
-        print("DONE: ", i)
+    parse_files()
@@ -1,9 +1,90 @@
+import hashlib
+import random
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from bson import json_util
+from src.utils import config
 from src.utils.Utils import Logger, get_doc_name
+from src.mainAPI.courses.db.Version import version_tracker
 
 
-# Define logger object.
+# Define logger objects.
 logger = Logger(__name__).get_query_logger()
+slow_logger = Logger("slow_query").get_slow_query_logger()
+
+# Explains of the sampled slow pipelines, which run after their requests.
+explain_executor = ThreadPoolExecutor(
+    max_workers=config.slow_query_explain_workers,
+    thread_name_prefix="slow_query_explain"
+)
+explain_slots = threading.BoundedSemaphore(
+    config.slow_query_explain_workers + config.slow_query_explain_queue
+)
+
+
+class QueryCache:
+    """
+    QueryCache keeps the results of the pipelines by their fingerprints, up to
+    'max_size' results in least recently used order. A result is dropped when it is
+    older than 'ttl' seconds, or when the data version is bumped by an ingestion.
+
+    """
+    def __init__(self, max_size: int = None, ttl: float = None, tracker=None):
+        self.max_size = max_size or config.query_cache_size
+        self.ttl = ttl or config.query_cache_ttl
+        self.tracker = tracker or version_tracker
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        version = self.tracker.current()
+        with self.lock:
+            entry = self.results.get(key)
+            if entry is not None:
+                result, created, entry_version = entry
+                if entry_version == version and time.time() - created < self.ttl:
+                    self.results.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self.results[key]
+            self.misses += 1
+        return None
+
+    def set(self, key: str, result: list):
+        version = self.tracker.current()
+        with self.lock:
+            self.results[key] = (result, time.time(), version)
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+        return self
+
+    def clear(self):
+        with self.lock:
+            self.results = OrderedDict()
+        return self
+
+
+# Shared cache object for the pipelines which opt in.
+query_cache = QueryCache()
+
+
+class Parameter:
+    """
+    Parameter is a placeholder for a value of a compiled pipeline, which is given
+    by its name when the pipeline is bound.
+
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f"Parameter({self.name!r})"
 
 
 class QueryPipeline:
@@ -11,14 +92,29 @@ class QueryPipeline:
             self,
             root_document,
             allow_disk_usage=False,
-            log: bool = True
+            log: bool = True,
+            optimize: bool = True,
+            cache: bool = False,
+            profile: bool = None,
+            slow_threshold: float = None
     ):
         self.document = root_document
         self.doc_name = get_doc_name(self.document)
         self.disk_usage = allow_disk_usage
         self.log_flag = log
+        self.optimize_flag = optimize
+        self.cache_flag = cache
+        if profile is None:
+            profile = config.query_profile
+        self.profile_flag = profile
+        if slow_threshold is None:
+            slow_threshold = config.slow_query_threshold
+        self.slow_threshold = slow_threshold
         self.pipeline = []
 
+        # Local and foreign fields of the joins, keyed by their output fields.
+        self.joins = dict()
+
     def match(self, conditions):
         self.pipeline.append({
             "$match": conditions
@@ -79,15 +175,39 @@ class QueryPipeline:
         })
         return self
 
-    def join(self, doc_name, local_field, foreign_field, output_field):
+    def join(self, doc_name, local_field, foreign_field, output_field,
+             fields=None, single=False):
+        """
+        Joins the documents of the given collection whose 'foreign_field' matches the
+        'local_field'. If 'fields' are given, the joined documents are projected to
+        these fields inside the lookup, so the other fields are not read into the
+        pipeline. The lookup is kept on the local and foreign fields, so it uses the
+        index of the foreign field, which needs MongoDB 5.0 with a lookup pipeline.
+
+        :param doc_name: Name of the joined collection.
+        :param local_field: Field of the current documents.
+        :param foreign_field: Field of the joined documents.
+        :param output_field: Field to put the joined documents.
+        :param fields: Fields of the joined documents to keep, all of them by default.
+        :param single: Unwind the joined documents, as there is a single one.
+        :return: QueryPipeline object itself.
+        """
+        lookup = {
+            "from": doc_name,
+            "localField": local_field,
+            "foreignField": foreign_field,
+            "as": output_field
+        }
+        if fields is not None:
+            lookup["pipeline"] = [
+                {"$project": {field: 1 for field in fields}}
+            ]
         self.pipeline.append({
-            "$lookup": {
-                "from": doc_name,
-                "localField": local_field,
-                "foreignField": foreign_field,
-                "as": output_field
-                }
-            })
+            "$lookup": lookup
+        })
+        self.joins[output_field] = (local_field, foreign_field, single)
+        if single:
+            self.parallelize(output_field)
         return self
 
     def parallelize(self, params):
@@ -224,19 +344,412 @@ class QueryPipeline:
         return self
 
     def copy(self):
-        temp_query_object = QueryPipeline(root_document=self.document)
+        temp_query_object = QueryPipeline(
+            root_document=self.document,
+            allow_disk_usage=self.disk_usage,
+            log=self.log_flag,
+            optimize=self.optimize_flag,
+            cache=self.cache_flag,
+            profile=self.profile_flag,
+            slow_threshold=self.slow_threshold
+        )
         temp_query_object.pipeline = self.pipeline.copy()
+        temp_query_object.joins = self.joins.copy()
         return temp_query_object
 
-    def run(self):
+    def compile(self):
+        """
+        Compiles the pipeline into a template, whose 'Parameter' placeholders are
+        filled by 'CompiledPipeline.bind'. The pipeline is optimized once here, so
+        the bound pipelines are neither rebuilt nor optimized again.
+
+        :return: CompiledPipeline object.
+        """
+        return CompiledPipeline(query=self)
+
+    # -------OPTIMIZATION FUNCTIONS--------
+    def _localize(self, conditions: dict, unwound: set) -> tuple:
+        # Splits the match conditions into the ones that could be written on the
+        # local fields of the joins, and the ones kept after the joins. Conditions
+        # on the joins of arrays are in both, as they only could be pre-filtered.
+        local_conditions = dict()
+        remaining_conditions = dict()
+        for key, value in conditions.items():
+            output_field, _, joined_field = key.partition(".")
+            join = self.joins.get(output_field)
+            if join is not None and output_field in unwound and joined_field == join[1]:
+                local_field, _, single = join
+                if single:
+                    local_conditions[key] = (local_field, value)
+                    continue
+                if self._is_equality(value):
+                    local_conditions[key] = (local_field, value)
+            remaining_conditions[key] = value
+        return local_conditions, remaining_conditions
+
+    @staticmethod
+    def _is_equality(value) -> bool:
+        # Equalities on an array of references keep the documents referring to the
+        # value, a superset of the documents keeping it after the unwind.
+        if not isinstance(value, dict):
+            return True
+        return len(value) != 0 and set(value) <= {"$eq", "$in"}
+
+    @staticmethod
+    def _earliest_position(pipeline: list, local_field: str, output_field: str) -> int:
+        # Walks back over the stages which neither change the local field, nor the
+        # number of the documents, up to the start of the pipeline.
+        position = len(pipeline)
+        joined = False
+        while position > 0:
+            stage = pipeline[position - 1]
+            if "$lookup" in stage:
+                lookup_output = stage["$lookup"]["as"]
+                if lookup_output == output_field and not joined:
+                    joined = True
+                elif lookup_output == local_field:
+                    break
+            elif "$unwind" in stage:
+                path = stage["$unwind"]
+                if isinstance(path, dict):
+                    path = path.get("path", "")
+                path = path.lstrip("$")
+                # Unwinds of the local field itself, rather than of the joined documents.
+                if path == local_field and (joined or path != output_field):
+                    break
+            elif "$match" not in stage and "$sort" not in stage:
+                break
+            position -= 1
+        return position
+
+    def optimize(self):
+        """
+        Moves the match conditions on the joined fields ahead of their joins, when
+        they could be expressed on the local reference fields. For instance, after
+        joining and unwinding 'course', a condition on 'course._id' is written as a
+        condition on 'course' and applied before the joins, so the joins run only
+        for the matching documents.
+
+        A condition is only replaced when the join is made with 'single', as a
+        single reference has the same value with the joined id. For an array of
+        references, an equality is copied before the joins as a pre-filter, and
+        the condition itself is kept after the unwind. Conditions are only moved
+        over joins, unwinds, matches and sorts that do not change the local field,
+        hence the result of the pipeline is the same.
+
+        :return: QueryPipeline object itself.
+        """
+        pipeline = list()
+        unwound = set()
+        for stage in self.pipeline:
+            if "$unwind" in stage:
+                path = stage["$unwind"]
+                if isinstance(path, dict):
+                    if path.get("preserveNullAndEmptyArrays"):
+                        # Documents without a joined document are kept by the unwind.
+                        path = ""
+                    else:
+                        path = path.get("path", "")
+                unwound.add(path.lstrip("$"))
+            if "$match" not in stage:
+                pipeline.append(stage)
+                continue
+
+            local_conditions, remaining_conditions = self._localize(stage["$match"], unwound)
+            for key, (local_field, value) in local_conditions.items():
+                position = self._earliest_position(pipeline, local_field, key.partition(".")[0])
+                pipeline.insert(position, {"$match": {local_field: value}})
+            if len(remaining_conditions) != 0:
+                pipeline.append({"$match": remaining_conditions})
+        self.pipeline = pipeline
+        return self
+
+    def fingerprint(self) -> str:
+        # Keys are not sorted, as the order of the keys of some stages such as '$sort'
+        # changes their results.
+        content = json_util.dumps(
+            [self.doc_name, self.pipeline, self.disk_usage],
+            default=str
+        )
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    # -------PROFILING FUNCTIONS--------
+    @staticmethod
+    def _stage_stats(name: str, stage: dict) -> dict:
+        execution_stats = stage.get("executionStats", dict())
+        return {
+            "stage": name,
+            "nReturned": stage.get("nReturned", execution_stats.get("nReturned")),
+            "executionTimeMillis": stage.get(
+                "executionTimeMillisEstimate", execution_stats.get("executionTimeMillis")
+            ),
+            "docsExamined": stage.get("totalDocsExamined", execution_stats.get("totalDocsExamined")),
+            "keysExamined": stage.get("totalKeysExamined", execution_stats.get("totalKeysExamined")),
+        }
+
+    def explain(self, verbosity: str = "executionStats", raw: bool = False):
+        """
+        Runs the pipeline with the 'explain' command of the server, and returns the
+        execution statistics of each stage; returned and examined documents, examined
+        index keys and estimated execution time.
+
+        :param str verbosity: Verbosity of the explain command.
+        :param bool raw: Return the raw output of the server instead of the stage statistics.
+        :return: List of stage statistics, or the raw output.
+        """
+        if self.optimize_flag:
+            self.optimize()
+        collection = self.document._get_collection()
+        result = collection.database.command(
+            "explain",
+            {
+                "aggregate": collection.name,
+                "pipeline": self.pipeline,
+                "allowDiskUse": self.disk_usage,
+                "cursor": {}
+            },
+            verbosity=verbosity
+        )
+        if raw:
+            return result
+
+        stages = list()
+        if "stages" in result:
+            for stage in result["stages"]:
+                name = next(
+                    (key for key in stage if key.startswith("$")), "unknown"
+                )
+                details = stage[name]
+                if name == "$cursor" and isinstance(details, dict):
+                    details = {**details, **stage}
+                else:
+                    details = stage
+                stages.append(
+                    self._stage_stats(name, details)
+                )
+        else:
+            # The whole pipeline is executed by the query layer.
+            stages.append(
+                self._stage_stats("$cursor", result)
+            )
+        return stages
+
+    def _profile(self, cursor, tick: float) -> list:
+        # Exhausts the cursor, so the measured time is the time of the execution.
+        result = list(cursor)
+        elapsed = time.time() - tick
+        if self.log_flag:
+            logger.info(
+                f"PROFILE DOCUMENT: {self.doc_name}, "
+                f"TIME: {elapsed}, "
+                f"RETURNED: {len(result)}, "
+                f"FINGERPRINT: {self.fingerprint()}."
+            )
+        if elapsed >= self.slow_threshold:
+            explain = random.random() < config.slow_query_explain_rate
+            if explain and explain_slots.acquire(blocking=False):
+                # Explain runs the pipeline again, so it is done for a sample of the slow
+                # pipelines by the explain executor, and the request does not wait for it.
+                query = self.copy()
+                query.optimize_flag = False
+                explain_executor.submit(
+                    query._log_slow, elapsed, len(result), True
+                ).add_done_callback(
+                    lambda future: explain_slots.release()
+                )
+            else:
+                self._log_slow(elapsed, len(result))
+        return result
+
+    def _log_slow(self, elapsed: float, returned: int, explain: bool = False):
+        msg = (
+            f"FINGERPRINT: {self.fingerprint()}, "
+            f"DOCUMENT: {self.doc_name}, "
+            f"TIME: {elapsed}, "
+            f"RETURNED: {returned}, "
+        )
+        if explain:
+            # The examined documents are only known for the explained pipelines.
+            try:
+                stages = self.explain()
+            except Exception as err:
+                logger.error(f"Slow pipeline could not be explained: {err}")
+            else:
+                examined = sum(stage["docsExamined"] or 0 for stage in stages)
+                msg += f"EXAMINED (SAMPLED): {examined}, STAGES: {stages}, "
+        slow_logger.warning(msg + f"PIPELINE: {self.pipeline}.")
+        return self
+
+    def _aggregate(self, batch_size: int = None):
+        options = dict()
+        if batch_size:
+            options["batchSize"] = batch_size
+        # The collection is used directly, the mongoengine queryset is only
+        # needed while ingesting the documents.
+        return self.document._get_collection().aggregate(
+            self.pipeline, allowDiskUse=self.disk_usage, **options
+        )
+
+    def run(self, batch_size: int = None):
+        if self.optimize_flag:
+            self.optimize()
+        if self.cache_flag:
+            key = self.fingerprint()
+            result = query_cache.get(key)
+            if result is not None:
+                if self.log_flag:
+                    logger.info(f"DOCUMENT: {self.doc_name}, CACHE HIT: {key}.")
+                return list(result)
+
         tick = time.time()
-        result = self.document.objects.aggregate(
-            pipeline=self.pipeline, allowDiskUse=self.disk_usage
+        result = self._aggregate(
+            batch_size=batch_size
         )
+        if self.profile_flag:
+            result = self._profile(result, tick)
+        if self.cache_flag:
+            result = list(result)
+            query_cache.set(key, result)
+            result = list(result)
         tock = time.time()
         if self.log_flag:
+            # Unless the result is fetched, only the first batch of the cursor is measured.
             msg = f"DOCUMENT: {self.doc_name}, "
-            msg += f"TIME: {tock-tick}, "
+            if isinstance(result, list):
+                msg += f"TIME: {tock-tick}, "
+            else:
+                msg += f"CURSOR TIME: {tock-tick}, "
             msg += f"PIPELINE: {self.pipeline}."
             logger.info(msg)
         return result
+
+    def stream(self, batch_size: int = None):
+        """
+        Yields the resulting documents one by one while the cursor fetches them in
+        batches of 'batch_size', so the whole result is never kept in memory. Cached
+        results are yielded if there is any, but streamed results are not cached.
+
+        :param int batch_size: Number of documents of each batch fetched by the cursor.
+        :return: Generator of the resulting documents.
+        """
+        if self.optimize_flag:
+            self.optimize()
+        if self.cache_flag:
+            result = query_cache.get(self.fingerprint())
+            if result is not None:
+                for document in result:
+                    yield document
+                return
+
+        if self.log_flag:
+            logger.info(
+                f"STREAM DOCUMENT: {self.doc_name}, "
+                f"BATCH SIZE: {batch_size}, "
+                f"PIPELINE: {self.pipeline}."
+            )
+        cursor = self._aggregate(
+            batch_size=batch_size
+        )
+        try:
+            for document in cursor:
+                yield document
+        finally:
+            cursor.close()
+
+    def to_frame(self, batch_size: int = None, columns: list = None) -> pd.DataFrame:
+        """
+        Builds a DataFrame from the resulting documents, by appending the values of
+        each document into the lists of its columns while the cursor is consumed, so
+        neither a list of documents nor a JSON round trip is needed.
+
+        :param int batch_size: Number of documents of each batch fetched by the cursor.
+        :param list columns: Columns to put first, in the given order.
+        :return: DataFrame of the resulting documents.
+        """
+        data = {column: list() for column in columns or list()}
+        if self.cache_flag:
+            documents = self.run(batch_size=batch_size)
+        else:
+            documents = self.stream(batch_size=batch_size)
+
+        count = 0
+        for document in documents:
+            for key, value in document.items():
+                column = data.get(key)
+                if column is None:
+                    column = data[key] = [None] * count
+                column.append(value)
+            count += 1
+            if len(document) != len(data):
+                for column in data.values():
+                    if len(column) < count:
+                        column.append(None)
+        return pd.DataFrame(data=data)
+
+
+class CompiledPipeline:
+    """
+    CompiledPipeline keeps a built and optimized pipeline whose values could be
+    'Parameter' placeholders. Binding the parameters copies only the stages and
+    the nested objects on the paths of the placeholders, the rest of the stages
+    are shared with the template.
+
+    """
+    def __init__(self, query: QueryPipeline):
+        if query.optimize_flag:
+            query.optimize()
+        self.query = query
+        self.pipeline = query.pipeline
+        self.parameters = list()
+        self._find_parameters(self.pipeline, tuple())
+
+    def _find_parameters(self, item, path: tuple):
+        if isinstance(item, Parameter):
+            self.parameters.append((path, item.name))
+        elif isinstance(item, dict):
+            for key, value in item.items():
+                self._find_parameters(value, path + (key,))
+        elif isinstance(item, list):
+            for index, value in enumerate(item):
+                self._find_parameters(value, path + (index,))
+
+    @property
+    def names(self) -> set:
+        return {name for _, name in self.parameters}
+
+    def bind(self, **params) -> QueryPipeline:
+        """
+        Fills the placeholders of the template with the given parameters.
+
+        :param params: Values of the parameters, keyed by their names.
+        :return: QueryPipeline object ready to run.
+        """
+        missing = self.names.difference(params)
+        if len(missing) != 0:
+            raise ValueError(f"Parameters of the compiled pipeline are not given: {sorted(missing)}")
+
+        pipeline = list(self.pipeline)
+        copied = set()
+        for path, name in self.parameters:
+            container = pipeline
+            for key in path[:-1]:
+                child = container[key]
+                if id(child) not in copied:
+                    child = child.copy()
+                    copied.add(id(child))
+                    container[key] = child
+                container = child
+            container[path[-1]] = params[name]
+
+        query = QueryPipeline(
+            root_document=self.query.document,
+            allow_disk_usage=self.query.disk_usage,
+            log=self.query.log_flag,
+            optimize=False,
+            cache=self.query.cache_flag,
+            profile=self.query.profile_flag,
+            slow_threshold=self.query.slow_threshold
+        )
+        query.pipeline = pipeline
+        query.joins = self.query.joins.copy()
+        return query
@@ -0,0 +1,94 @@
+import datetime
+import threading
+import time
+from pymongo import UpdateOne
+from src.utils import config
+from src.mainAPI.courses.db.Connector import main_conn
+from src.mainAPI.courses.db import MongoDB as db
+
+
+# Key of the version of the whole data.
+global_key = "global"
+
+
+def course_key(course_id) -> str:
+    return f"course:{course_id}"
+
+
+def bump_version(keys: list = None) -> int:
+    """
+    The function increments the data version of the given keys and the global data
+    version. Ingestion runs call it after they write, so the results derived from
+    the previous data could be invalidated.
+
+    :param keys: Keys of the versions to increment besides the global one.
+    :return: New global data version.
+    """
+    main_conn.connect()
+    now = datetime.datetime.utcnow()
+    keys = list(dict.fromkeys([global_key] + list(keys or list())))
+    db.DataVersion._get_collection().bulk_write(
+        [
+            UpdateOne(
+                {"_id": key},
+                {"$inc": {"version": 1}, "$set": {"updated": now}},
+                upsert=True
+            )
+            for key in keys
+        ],
+        ordered=False
+    )
+    return get_version()
+
+
+def read_version(key: str = global_key) -> tuple:
+    main_conn.connect()
+    version = db.DataVersion._get_collection().find_one(
+        {"_id": key}
+    )
+    if version is None:
+        return 0, None
+    return version.get("version", 0), version.get("updated")
+
+
+def get_version(key: str = global_key) -> int:
+    return read_version(key)[0]
+
+
+class VersionTracker:
+    """
+    VersionTracker keeps the last read data versions in the process, and reads them
+    again from the database at most once in every 'check_interval' seconds.
+
+    """
+    def __init__(self, check_interval: float = None):
+        if check_interval is None:
+            check_interval = config.version_check_interval
+        self.check_interval = check_interval
+        self.versions = dict()
+        self.lock = threading.Lock()
+
+    def _read(self, key: str) -> tuple:
+        now = time.time()
+        with self.lock:
+            version, updated, checked = self.versions.get(key, (None, None, 0))
+        if version is None or now - checked >= self.check_interval:
+            version, updated = read_version(key)
+            with self.lock:
+                self.versions[key] = (version, updated, now)
+        return version, updated
+
+    def current(self, key: str = global_key) -> int:
+        return self._read(key)[0]
+
+    def updated(self, key: str = global_key):
+        return self._read(key)[1]
+
+    def reset(self):
+        with self.lock:
+            self.versions = dict()
+        return self
+
+
+# Shared tracker object of the process.
+version_tracker = VersionTracker()
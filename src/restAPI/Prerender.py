@@ -0,0 +1,236 @@
+import argparse
+import datetime
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from src.utils import config
+from src.utils.Utils import Logger
+from src.mainAPI.courses.db.Connector import main_conn
+from src.mainAPI.courses.db.Version import course_key, get_version, version_tracker
+from src.mainAPI.courses.db.Query import query_cache
+import src.mainAPI.courses.db.MongoDB as db
+
+
+# Define logger object.
+logger = Logger(__name__).get_courses_logger()
+
+# Root directory of the project, the application is imported from there by the workers.
+root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Directory of the pre-rendered pages and their manifest.
+default_output_path = os.path.join(root_path, "src", "restAPI", "build", "prerendered", "")
+manifest_file = "manifest.json"
+
+# Import path of the Flask application which renders the pages, as 'module:attribute'.
+default_app = "start:app"
+
+
+class PrerenderedPages:
+    """
+    PrerenderedPages keeps the first pages of the course results rendered ahead of
+    the requests. Each page is stored with the data version of its course in its
+    file name, hence a page is served only while its course is not ingested again.
+    The manifest keeps the versions of the rendered pages, so a build renders only
+    the courses whose versions are changed since the last build.
+
+    """
+    def __init__(self, path: str = None):
+        self.path = os.path.join(path, "") if path else default_output_path
+
+    def page_file(self, course_id: int, version: int) -> str:
+        return self.path + f"course_{course_id}_v{version}.html"
+
+    def read(self, course_id: int, version: int):
+        try:
+            with open(self.page_file(course_id, version), "r", encoding="utf-8") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, course_id: int, version: int, page: str):
+        file_path = self.page_file(course_id, version)
+        temp_path = file_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(page)
+        os.replace(temp_path, file_path)
+        return self
+
+    def load_manifest(self) -> dict:
+        try:
+            with open(self.path + manifest_file, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {"courses": dict()}
+
+    def save_manifest(self, manifest: dict):
+        temp_path = self.path + manifest_file + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path + manifest_file)
+        return self
+
+    @staticmethod
+    def course_versions() -> dict:
+        # Current data versions of all of the courses, the courses which are never
+        # bumped are at version 0.
+        prefix = course_key("")
+        versions = {
+            document["_id"]: 0
+            for document in db.Course._get_collection().find({}, projection={"_id": True})
+        }
+        cursor = db.DataVersion._get_collection().find(
+            {"_id": {"$regex": "^" + prefix}},
+            projection={"version": True}
+        )
+        for document in cursor:
+            try:
+                course_id = int(document["_id"][len(prefix):])
+            except ValueError:
+                continue
+            if course_id in versions:
+                versions[course_id] = document.get("version", 0)
+        return versions
+
+    def build(
+            self,
+            workers: int = None,
+            full: bool = False,
+            chunk_size: int = 50,
+            app: str = None
+    ) -> list:
+        """
+        Renders the first result page of every course whose data version is changed
+        since the last build, or whose page is missing, with a pool of worker processes.
+        Pages of the previous versions are removed after the new ones are written.
+
+        :param int workers: Number of worker processes, default is the number of cores.
+        :param bool full: Render the pages of all of the courses.
+        :param int chunk_size: Number of pages rendered by a worker at once.
+        :param str app: Import path of the Flask application, 'start:app' by default.
+        :return: Ids of the rendered courses.
+        """
+        main_conn.connect()
+        os.makedirs(self.path, exist_ok=True)
+        tick = time.time()
+        manifest = self.load_manifest()
+        rendered_versions = manifest.get("courses", dict())
+        versions = self.course_versions()
+        pages = [
+            (course_id, version) for course_id, version in sorted(versions.items())
+            if full
+            or rendered_versions.get(str(course_id)) != version
+            or not os.path.isfile(self.page_file(course_id, version))
+        ]
+        chunks = [
+            pages[index:index + chunk_size]
+            for index in range(0, len(pages), chunk_size)
+        ]
+
+        rendered = list()
+        if len(chunks) != 0:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=context,
+                    initializer=_connect_worker
+            ) as executor:
+                for chunk_rendered in executor.map(
+                        _render_pages,
+                        chunks,
+                        [self.path] * len(chunks),
+                        [app or default_app] * len(chunks)
+                ):
+                    rendered += chunk_rendered
+
+        for course_id, version in rendered:
+            old_version = rendered_versions.get(str(course_id))
+            if old_version is not None and old_version != version:
+                try:
+                    os.remove(self.page_file(course_id, old_version))
+                except FileNotFoundError:
+                    pass
+            rendered_versions[str(course_id)] = version
+        for course_id in set(rendered_versions).difference(str(course_id) for course_id in versions):
+            # Courses which are removed from the data.
+            try:
+                os.remove(self.page_file(course_id, rendered_versions.pop(course_id)))
+            except FileNotFoundError:
+                pass
+        self.save_manifest({
+            "courses": rendered_versions,
+            "global": get_version(),
+            "updated": datetime.datetime.utcnow().isoformat()
+        })
+        logger.info(
+            f"Pre-rendered {len(rendered)} of {len(versions)} course pages, "
+            f"total time it takes: {time.time() - tick}"
+        )
+        return [course_id for course_id, _ in rendered]
+
+
+# -------HELPER FUNCTIONS--------
+def _connect_worker():
+    main_conn.connect()
+
+
+def _import_app(app: str):
+    # The application is imported from the root of the project, whatever the working
+    # directory of the process is.
+    if root_path not in sys.path:
+        sys.path.insert(0, root_path)
+    module, _, attribute = app.partition(":")
+    return getattr(importlib.import_module(module), attribute or "app")
+
+
+def _render_pages(pages: list, path: str, app: str) -> list:
+    # The application is imported by the workers only, as its routes use this module.
+    app = _import_app(app)
+    from src.restAPI.resorces.courses import render_result
+
+    # Pages must be rendered from the data of their versions, not from cached results.
+    version_tracker.reset()
+    query_cache.clear()
+    store = PrerenderedPages(path=path)
+    rendered = list()
+    for course_id, version in pages:
+        with app.test_request_context():
+            page = render_result(
+                course_id=course_id,
+                after=None,
+                limit=config.records_page_size
+            )
+        store.write(course_id, version, page)
+        rendered.append((course_id, version))
+    return rendered
+
+
+# Shared pre-rendered pages of the application.
+prerendered_pages = PrerenderedPages()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Pre-renders the result pages of the courses changed since the last build."
+    )
+    arg_parser.add_argument("--workers", type=int, default=None)
+    arg_parser.add_argument("--full", action="store_true")
+    arg_parser.add_argument("--path", default=None)
+    arg_parser.add_argument("--app", default=default_app)
+    args = arg_parser.parse_args()
+
+    rendered = PrerenderedPages(
+        path=args.path
+    ).build(
+        workers=args.workers,
+        full=args.full,
+        app=args.app
+    )
+    print(f"{len(rendered)} course pages are rendered.")
+
+
+if __name__ == "__main__":
+    main()
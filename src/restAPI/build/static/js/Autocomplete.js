@@ -7,6 +7,7 @@ const DEFAULTS = {
   value: 'value',
   showValue: false,
   showValueBeforeLabel: false,
+  filter: true,
 };
 
 class Autocomplete {
@@ -66,10 +67,10 @@ class Autocomplete {
 
   createItem(lookup, item) {
     let label;
-    if (this.options.highlightTyped) {
-      const idx = removeDiacritics(item.label)
-          .toLowerCase()
-          .indexOf(removeDiacritics(lookup).toLowerCase());
+    const idx = removeDiacritics(item.label)
+        .toLowerCase()
+        .indexOf(removeDiacritics(lookup).toLowerCase());
+    if (this.options.highlightTyped && idx >= 0) {
       const className = Array.isArray(this.options.highlightClass) ? this.options.highlightClass.join(' ')
         : (typeof this.options.highlightClass == 'string' ? this.options.highlightClass : '');
       label = item.label.toString().substring(0, idx)
@@ -111,7 +112,8 @@ class Autocomplete {
           value: this.options.value ? entry[this.options.value] : entry
       };
 
-      if (removeDiacritics(item.label).toLowerCase().indexOf(removeDiacritics(lookup).toLowerCase()) >= 0) {
+      if (!this.options.filter
+          || removeDiacritics(item.label).toLowerCase().indexOf(removeDiacritics(lookup).toLowerCase()) >= 0) {
         items.appendChild(this.createItem(lookup, item));
         if (this.options.maximumItems > 0 && ++count >= this.options.maximumItems)
           break;
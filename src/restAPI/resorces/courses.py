@@ -1,16 +1,98 @@
-from flask import Blueprint, render_template, url_for, request, redirect
+from functools import wraps
+from flask import Blueprint, Response, render_template, url_for, request, redirect, jsonify, stream_with_context, \
+    make_response, stream_template
 from src.mainAPI.courses.Courses import Course
-from src.utils.Utils import courses_index_form, convert_df_to_html
+from src.mainAPI.courses.db.Version import version_tracker, global_key, course_key
+from src.mainAPI.courses.Search import course_index
+from src.restAPI.Prerender import prerendered_pages
+from src.utils import config
+from src.utils.Utils import courses_index_form, courses_batch_form, records_page_form, render_html_table, \
+    iter_html_table, iter_json_array, iter_ndjson
 
 
 courses = Blueprint("courses", __name__, url_prefix="/courses")
 
 
+# -------HELPER FUNCTIONS--------
+def _validators(keys: list) -> tuple:
+    etag = "v" + "-".join(
+        str(version_tracker.current(key)) for key in keys
+    )
+    updated = [version_tracker.updated(key) for key in keys]
+    updated = [value for value in updated if value is not None]
+    last_modified = max(updated) if len(updated) != 0 else None
+    return etag, last_modified
+
+
+def _is_modified(etag: str, last_modified) -> bool:
+    if request.if_none_match:
+        return not request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified.replace(microsecond=0) > request.if_modified_since.replace(tzinfo=None)
+    return True
+
+
+class RecordsTable:
+    """
+    RecordsTable renders the records table in pieces while the template iterates it,
+    hence the records are fetched only when the template reaches the table. One more
+    record than the page is loaded, so the 'next_after' of the page is known after
+    the table is iterated, only if there is a next page.
+
+    """
+    def __init__(self, load, limit: int):
+        self.load = load
+        self.limit = limit
+        self.next_after = None
+
+    def __iter__(self):
+        records = self.load()
+        if len(records) > self.limit:
+            records = records[:self.limit]
+            last_record = records[-1]
+            self.next_after = f"{last_record['semesterId']}-{last_record['courseSection']}"
+        return iter_html_table(
+            records=records
+        )
+
+
+def versioned(per_course: bool = False):
+    """
+    The decorator makes the GET responses of the view conditional on the data version,
+    which is bumped by the ingestions. The ETag and Last-Modified of the response are
+    obtained from the version of the course, or from the global version, and a request
+    whose validators still match is answered by '304 Not Modified' before the view runs.
+
+    :param bool per_course: Use the version of the 'course_id' of the view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if request.method != "GET":
+                return view(**kwargs)
+            if per_course:
+                keys = [course_key(kwargs["course_id"])]
+            else:
+                keys = [global_key]
+            etag, last_modified = _validators(keys)
+            if _is_modified(etag, last_modified):
+                response = make_response(view(**kwargs))
+            else:
+                response = Response(status=304)
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
 @courses.route(
     rule="/courses",
     methods=["GET", "POST"],
     endpoint="index"
 )
+@versioned()
 def index():
     if request.method == "POST":
         course_id, = courses_index_form(form=request.form)
@@ -21,31 +103,144 @@ def index():
             )
         )
     else:
-        course_ids = Course().get_all_course_ids()
         return render_template(
             template_name_or_list="/courses/index.html",
-            course_ids=course_ids
+            max_items=config.autocomplete_max_items
         )
 
 
+@courses.route(
+    rule="/courses/autocomplete",
+    endpoint="autocomplete"
+)
+@versioned()
+def autocomplete():
+    try:
+        limit = int(request.args.get("limit", config.autocomplete_max_items))
+    except ValueError:
+        limit = config.autocomplete_max_items
+    limit = min(max(limit, 1), config.autocomplete_max_items)
+    matches = course_index.search(
+        prefix=request.args.get("q", ""),
+        limit=limit
+    )
+    return jsonify([
+        {"label": str(course_id), "value": course_name}
+        for course_id, course_name in matches
+    ])
+
+
 @courses.route(
     rule="/courses/<int:course_id>/",
     endpoint="result"
 )
+@versioned(per_course=True)
 def result(course_id: int):
-    course = Course(course_id=course_id)
-    course_name = course.get_course_name()
-    course_info = convert_df_to_html(
-        data=course.get_course_df()
+    after, limit = records_page_form(
+        args=request.args,
+        default_limit=config.records_page_size,
+        max_limit=config.records_max_page_size
     )
-    records = convert_df_to_html(
-        data=course.get_records_df(),
-        index=False
+    if after is None and limit == config.records_page_size:
+        # First pages are pre-rendered for the current versions of the courses.
+        page = prerendered_pages.read(
+            course_id=course_id,
+            version=version_tracker.current(course_key(course_id))
+        )
+        if page is not None:
+            return page
+    # The page is sent while it is rendered, the records table follows the course info
+    # as soon as the records are fetched.
+    return Response(
+        stream_template(
+            template_name_or_list="/courses/result.html",
+            **_result_context(course_id=course_id, after=after, limit=limit)
+        ),
+        mimetype="text/html"
     )
+
+
+def render_result(course_id: int, after: tuple, limit: int) -> str:
     return render_template(
         template_name_or_list="/courses/result.html",
-        records=records,
-        course_info=course_info,
-        course_id=course_id,
-        course_name=course_name
+        **_result_context(course_id=course_id, after=after, limit=limit)
+    )
+
+
+def _result_context(course_id: int, after: tuple, limit: int) -> dict:
+    course = Course(course_id=course_id)
+    course_name = course.get_course_name()
+    course_data = course.get_course_data() or dict()
+    course_info = render_html_table(
+        records=({"course": value} for value in course_data.values()),
+        columns=["course"],
+        index=list(course_data.keys())
+    )
+    records = RecordsTable(
+        load=lambda: course.get_records_list(after=after, limit=limit + 1),
+        limit=limit
+    )
+    return {
+        "records": records,
+        "course_info": course_info,
+        "course_id": course_id,
+        "course_name": course_name,
+        "after": after,
+        "limit": limit
+    }
+
+
+@courses.route(
+    rule="/courses/<int:course_id>/records",
+    endpoint="records"
+)
+@versioned(per_course=True)
+def records(course_id: int):
+    after, limit = records_page_form(
+        args=request.args,
+        default_limit=config.records_page_size,
+        max_limit=config.records_max_page_size
+    )
+    if not request.args.get("limit"):
+        # The whole history is streamed unless a page is asked.
+        limit = None
+    simplified = request.args.get("simplified", "true").lower() != "false"
+    documents = Course(course_id=course_id).stream_records(
+        simplified=simplified,
+        after=after,
+        limit=limit,
+        batch_size=config.records_stream_chunk_size
+    )
+    if request.args.get("format", "json").lower() == "ndjson":
+        body = iter_ndjson(documents, chunk_size=config.records_stream_chunk_size)
+        mimetype = "application/x-ndjson"
+    else:
+        body = iter_json_array(documents, chunk_size=config.records_stream_chunk_size)
+        mimetype = "application/json"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype
+    )
+
+
+@courses.route(
+    rule="/courses/batch",
+    endpoint="batch"
+)
+@versioned()
+def batch():
+    course_ids = courses_batch_form(
+        args=request.args,
+        max_ids=config.batch_max_courses
+    )
+    simplified = request.args.get("simplified", "true").lower() != "false"
+    records = Course.get_many_records(
+        course_ids=course_ids,
+        simplified=simplified
+    )
+    return jsonify(
+        courses=[
+            {"courseId": course_id, "records": course_records}
+            for course_id, course_records in records.items()
+        ]
     )
@@ -1,7 +1,16 @@
+import json
 import logging
+import math
 import os
+import re
 import sys
 import pandas as pd
+from pandas.io.formats.format import format_array
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class Logger:
@@ -97,6 +106,11 @@ class Logger:
         self.update_logger_attr(file_name="query.log")
         return self.get_logger()
 
+    def get_slow_query_logger(self):
+        self._level = logging.INFO
+        self.update_logger_attr(file_name="slow_query.log")
+        return self.get_logger()
+
     def get_course_logger(self):
         self._level = logging.INFO
         self.update_logger_attr(file_name="course.log")
@@ -278,6 +292,79 @@ def schedule_index(name: str, feature: str):
         return None
 
 
+# Features of each schedule slot, the columns are named as 'Day 1', 'Start Hour 1' etc.
+schedule_features = [
+    "Day",
+    "Start Hour",
+    "End Hour",
+    "Classroom Building",
+    "Classroom"
+]
+
+# Row key holding the already normalised schedule slots of a row.
+schedule_slots_key = "scheduleSlots"
+
+
+def schedule_table(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    The function reshapes the wide schedule columns of a sheet ('Day 1', 'Start Hour 1',
+    ..., 'Classroom 6') into a long table, with one line for each non-empty slot of each
+    row. The columns are matched once for the whole sheet, and the reshaping is done
+    by pandas instead of scanning the keys of every row.
+
+    :param data: Sheet data, each line is a row of the sheet.
+    :return: Long table with the columns 'row', 'slot' and the schedule features.
+    :rtype: pd.DataFrame
+    """
+    pattern = r"^(" + "|".join(re.escape(feature) for feature in schedule_features) + r")\s*(\d+)$"
+    columns = data.columns.to_series(
+        index=range(len(data.columns))
+    ).astype(str).str.extract(pattern).dropna()
+    if columns.empty:
+        return pd.DataFrame(columns=["row", "slot"] + schedule_features)
+
+    schedule = data.iloc[:, columns.index].astype(object).reset_index(drop=True)
+    schedule.columns = pd.MultiIndex.from_arrays(
+        [columns[0].values, columns[1].astype(int).values],
+        names=["feature", "slot"]
+    )
+    table = schedule.stack(
+        level="slot",
+        dropna=True
+    )
+    table = table.reindex(
+        columns=[feature for feature in schedule_features if feature in table.columns]
+    )
+    table.index = table.index.set_names(["row", "slot"])
+    return table.reset_index()
+
+
+def attach_schedule_slots(rows: list, table: pd.DataFrame) -> list:
+    """
+    The function puts the slots of the long schedule table into the rows they belong to,
+    under the 'schedule_slots_key' key, as lists of feature dictionaries ordered by slot.
+
+    :param rows: List of row dictionaries in the same order with the schedule table rows.
+    :param table: Long schedule table obtained by 'schedule_table'.
+    :return: Rows with their schedule slots.
+    """
+    for data in rows:
+        data[schedule_slots_key] = list()
+    features = [feature for feature in schedule_features if feature in table.columns]
+    table = table.sort_values(["row", "slot"])
+    for line in zip(table["row"].values, *(table[feature].values for feature in features)):
+        slot = dict()
+        for feature, value in zip(features, line[1:]):
+            if value is None or (isinstance(value, float) and value != value):
+                continue
+            if hasattr(value, "item"):
+                value = value.item()
+            slot[feature] = value
+        if len(slot) != 0:
+            rows[int(line[0])][schedule_slots_key].append(slot)
+    return rows
+
+
 def courses_index_form(form: dict):
     params_dict = {
         "course_id": 0,
@@ -295,6 +382,57 @@ def courses_index_form(form: dict):
     return tuple(params_dict.values())
 
 
+def records_page_form(args: dict, default_limit: int, max_limit: int) -> tuple:
+    """
+    The function parses the pagination parameters of the course records pages.
+    'after' is given as '<semester id>-<section>' of the last record of the previous
+    page, and 'limit' is the number of records of the page.
+
+    :return: Tuple of 'after' as (semester id, section) or None, and 'limit'.
+    """
+    after = None
+    if args.get("after"):
+        try:
+            semester, section = str(args["after"]).split("-")
+            after = (int(semester), int(section))
+        except ValueError:
+            after = None
+
+    limit = default_limit
+    if args.get("limit"):
+        try:
+            limit = int(args["limit"])
+        except ValueError:
+            limit = default_limit
+    limit = min(max(limit, 1), max_limit)
+    return after, limit
+
+
+def courses_batch_form(args, max_ids: int) -> list:
+    """
+    The function parses the course ids of the batch requests, which are given either
+    as comma separated 'ids', or as repeated 'ids' parameters. Invalid ids are skipped,
+    and at most 'max_ids' of the ids are returned.
+
+    :return: List of the course ids.
+    """
+    if hasattr(args, "getlist"):
+        values = args.getlist("ids")
+    else:
+        values = [args.get("ids", "")]
+
+    course_ids = list()
+    for value in values:
+        for item in str(value).split(","):
+            try:
+                course_id = int(item)
+            except ValueError:
+                continue
+            if course_id not in course_ids:
+                course_ids.append(course_id)
+    return course_ids[:max_ids]
+
+
 def get_doc_name(doc: object) -> str:
     """
     The function takes 'Document' class as input, and returns the document name of the object
@@ -332,3 +470,196 @@ def convert_df_to_html(
     return html_string
 
 
+# Characters escaped in the cells of the HTML tables, same as 'DataFrame.to_html'.
+html_escape_table = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def _format_html_column(values: list) -> list:
+    # Integers, booleans and single line strings are written as they are, and integers
+    # with missing values as the floats pandas turns them into. The other columns are
+    # formatted by pandas to keep the output of 'DataFrame.to_html'.
+    kinds = set(map(type, values))
+    if kinds == {int, type(None)} and all(value is None or abs(value) <= 1e6 for value in values):
+        return ["NaN" if value is None else f"{value}.0" for value in values]
+    for value in values:
+        kind = type(value)
+        if kind is str:
+            if "\t" in value or "\r" in value or "\n" in value:
+                break
+        elif kind is not int and kind is not bool:
+            break
+    else:
+        return [str(value).translate(html_escape_table).strip() for value in values]
+    formatted = format_array(
+        pd.Series(values, dtype=None if len(values) != 0 else object).values,
+        None,
+        na_rep="NaN"
+    )
+    return [str(value).translate(html_escape_table).strip() for value in formatted]
+
+
+def iter_html_table(
+        records,
+        columns: list = None,
+        index: list = None,
+        chunk_size: int = 500
+):
+    """
+    The function renders the records into the same HTML table with 'convert_df_to_html',
+    without building a DataFrame and calling 'DataFrame.to_html'. The table is yielded in
+    pieces, the header first if the columns are given, and the rows in chunks of
+    'chunk_size' rows. As the format of a column depends on all of its values, the
+    records are consumed before the rows are yielded.
+
+    :param records: Iterable of the record dictionaries, such as a cursor.
+    :param list columns: Columns of the table, the keys of the records by default.
+    :param list index: Labels of the rows, the table is written without index if not given.
+    :param int chunk_size: Number of rows in each yielded piece.
+    :return: Generator of the pieces of the HTML string.
+    """
+    def header(names: list) -> str:
+        cells = list()
+        if index is not None:
+            cells.append('      <th style="min-width: 120px;"></th>\n')
+        for name in names:
+            name = str(name).translate(html_escape_table).strip()
+            cells.append(f'      <th style="min-width: 120px;">{name}</th>\n')
+        return (
+            '<table border="1" class ="table table-striped">\n'
+            '  <thead>\n'
+            '    <tr style="text-align: center;">\n'
+            + "".join(cells)
+            + '    </tr>\n'
+            '  </thead>\n'
+            '  <tbody>\n'
+        )
+
+    data = {column: list() for column in columns or list()}
+    if columns is not None:
+        yield header(columns)
+    count = 0
+    for record in records:
+        for key, value in record.items():
+            column = data.get(key)
+            if column is None:
+                if columns is not None:
+                    continue
+                column = data[key] = [None] * count
+            column.append(value)
+        count += 1
+        if len(record) != len(data):
+            for column in data.values():
+                if len(column) < count:
+                    column.append(None)
+    if columns is None:
+        yield header(list(data.keys()))
+    if len(data) == 0:
+        count = 0
+
+    cells = [_format_html_column(values) for values in data.values()]
+    if index is not None:
+        cells.insert(0, _format_html_column(list(index)))
+    kinds = ["td"] * len(data)
+    if index is not None:
+        kinds.insert(0, "th")
+    for start in range(0, count, chunk_size):
+        rows = list()
+        for line in zip(*(column[start:start + chunk_size] for column in cells)):
+            rows.append("    <tr>\n")
+            for kind, cell in zip(kinds, line):
+                rows.append(f"      <{kind}>{cell}</{kind}>\n")
+            rows.append("    </tr>\n")
+        yield "".join(rows)
+    yield (
+        '  </tbody>\n'
+        '</table>\n'
+        f'<p>{count} rows × {len(data)} columns</p>'
+    )
+
+
+def render_html_table(records, columns: list = None, index: list = None) -> str:
+    return "".join(
+        iter_html_table(
+            records=records,
+            columns=columns,
+            index=index
+        )
+    )
+
+
+def _replace_nan(data):
+    # NaN and infinite values are replaced by None, as 'orjson' encodes them as null.
+    if isinstance(data, float):
+        return data if math.isfinite(data) else None
+    if isinstance(data, dict):
+        return {key: _replace_nan(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_replace_nan(value) for value in data]
+    return data
+
+
+def dumps_json(data) -> bytes:
+    """
+    The function encodes the data into JSON bytes, with 'orjson' if it is installed,
+    and with the standard 'json' module otherwise. Values which are not supported
+    by JSON, such as dates or object ids, are encoded as strings, and NaN values
+    are encoded as null by both of the modules.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    try:
+        content = json.dumps(
+            data,
+            default=str,
+            allow_nan=False,
+            separators=(",", ":")
+        )
+    except ValueError:
+        content = json.dumps(
+            _replace_nan(data),
+            default=str,
+            separators=(",", ":")
+        )
+    return content.encode("utf-8")
+
+
+def iter_json_array(documents, chunk_size: int = 100):
+    """
+    The function encodes the documents one by one into a single JSON array, and
+    yields the array in chunks of 'chunk_size' documents, so the array is never
+    kept in memory as a whole.
+
+    :param documents: Iterable of the documents, such as a cursor.
+    :param int chunk_size: Number of documents in each yielded chunk.
+    :return: Generator of the bytes of the array.
+    """
+    chunk = [b"["]
+    separator = b""
+    for document in documents:
+        chunk.append(separator)
+        chunk.append(dumps_json(document))
+        separator = b","
+        if len(chunk) >= 2 * chunk_size:
+            yield b"".join(chunk)
+            chunk = list()
+    chunk.append(b"]")
+    yield b"".join(chunk)
+
+
+def iter_ndjson(documents, chunk_size: int = 100):
+    """
+    The function encodes each document as a line of JSON, and yields the lines in
+    chunks of 'chunk_size' documents.
+
+    :param documents: Iterable of the documents, such as a cursor.
+    :param int chunk_size: Number of documents in each yielded chunk.
+    :return: Generator of the bytes of the lines.
+    """
+    chunk = list()
+    for document in documents:
+        chunk.append(dumps_json(document) + b"\n")
+        if len(chunk) >= chunk_size:
+            yield b"".join(chunk)
+            chunk = list()
+    if len(chunk) != 0:
+        yield b"".join(chunk)
@@ -17,3 +17,45 @@ password = "qQptnG6nRLpM30yu"
 
 # Connection host.
 host = host_url.replace("<password>", password)
+
+# --------------Query Configuration----------
+
+# Maximum number of pipeline results kept in the query cache.
+query_cache_size = 256
+
+# Seconds that a cached pipeline result stays valid.
+query_cache_ttl = 600
+
+# Seconds between two reads of the data version from the database.
+version_check_interval = 30
+
+# Whether the pipelines measure their execution, unless it is given by the pipeline itself.
+query_profile = False
+
+# Seconds after which a profiled pipeline is written to the slow query log.
+slow_query_threshold = 0.5
+
+# Share of the slow pipelines which are explained after their requests, between 0 and 1.
+# Only the explained pipelines are logged with the number of the examined documents.
+slow_query_explain_rate = 0.1
+
+# Number of the threads explaining the slow pipelines, and of the explains which can wait
+# for them. The sampled pipelines are logged without an explain when all of them are taken.
+slow_query_explain_workers = 1
+slow_query_explain_queue = 8
+
+# Number of records shown in a page of course records, and its upper limit.
+records_page_size = 100
+records_max_page_size = 1000
+
+# Maximum number of courses asked in a single batch request.
+batch_max_courses = 50
+
+# Maximum number of courses suggested by the autocomplete.
+autocomplete_max_items = 10
+
+# Number of records encoded in each chunk of the streamed JSON responses.
+records_stream_chunk_size = 100
+
+# Seconds that a request waits for the same query in flight before running it itself.
+single_flight_timeout = 10
@@ -0,0 +1,124 @@
+import os
+import sys
+import mongoengine
+import mongomock
+import mongomock.collection
+import pytest
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import config
+from src.mainAPI.courses.Search import course_index
+from src.mainAPI.courses.db.Connector import main_conn
+from src.mainAPI.courses.db.Helper import dimension_cache
+from src.mainAPI.courses.db.Query import query_cache
+from src.mainAPI.courses.db.Version import version_tracker
+
+
+# Columns of the search results sheet, in the order of the real exports.
+sheet_columns = [
+    "Semester", "Course Code", "Course Name", "Course Section", "Capacity",
+    "Exchange Capacity", "Exchange Used Capacity", "Course Status",
+    "Instructor Name", "Instructor Title",
+    "Day 1", "Start Hour 1", "End Hour 1", "Classroom Building 1", "Classroom 1",
+    "Day 2", "Start Hour 2", "End Hour 2", "Classroom Building 2", "Classroom 2",
+]
+
+
+def _aggregate(aggregate):
+    # mongomock does not know the '$unset' stage, it is the same with an exclusion.
+    # It neither knows the lookups with both local fields and a pipeline, which are
+    # only used to project the joined documents, so they are projected after them.
+    def wrapper(self, pipeline, *args, **kwargs):
+        stages = list()
+        for stage in pipeline:
+            if "$unset" in stage:
+                fields = stage["$unset"]
+                if isinstance(fields, str):
+                    fields = [fields]
+                stage = {"$project": {field: 0 for field in fields}}
+            if "$lookup" in stage and "localField" in stage["$lookup"] and "pipeline" in stage["$lookup"]:
+                lookup = dict(stage["$lookup"])
+                (projection,) = [step["$project"] for step in lookup.pop("pipeline")]
+                joined = {"_id": "$$joined._id"}
+                joined.update({field: "$$joined." + field for field in projection})
+                stages.append({"$lookup": lookup})
+                output = lookup["as"]
+                stage = {"$addFields": {output: {"$map": {"input": "$" + output, "as": "joined", "in": joined}}}}
+            stages.append(stage)
+        return aggregate(self, stages, *args, **kwargs)
+    return wrapper
+
+
+mongomock.collection.Collection.aggregate = _aggregate(mongomock.collection.Collection.aggregate)
+
+
+@pytest.fixture
+def database():
+    mongoengine.disconnect_all()
+    mongoengine.connect(
+        db=config.name,
+        host="mongodb://localhost",
+        alias=config.alias,
+        mongo_client_class=mongomock.MongoClient,
+        uuidRepresentation="standard"
+    )
+    main_conn.set_online(True)
+    dimension_cache.clear()
+    query_cache.clear()
+    version_tracker.reset()
+    course_index.version = None
+    yield mongoengine.get_db(config.alias)
+    dimension_cache.clear()
+    query_cache.clear()
+    version_tracker.reset()
+    mongoengine.disconnect_all()
+    main_conn.set_online(False)
+
+
+@pytest.fixture
+def client(database):
+    from start import app
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def sheet_row(index: int, semester: str = "2022-2023 Fall", **values) -> dict:
+    row = {
+        "Semester": semester,
+        "Course Code": 2360100 + index % 3,
+        "Course Name": f"COURSE {index % 3}",
+        "Course Section": index,
+        "Capacity": 40,
+        "Exchange Capacity": None,
+        "Exchange Used Capacity": None,
+        "Course Status": "Open",
+        "Instructor Name": f"INSTRUCTOR {index % 2}",
+        "Instructor Title": "Dr.",
+        "Day 1": "Monday",
+        "Start Hour 1": "08:40",
+        "End Hour 1": "10:30",
+        "Classroom Building 1": "BUILDING",
+        "Classroom 1": f"ROOM {index % 2}",
+        "Day 2": None,
+        "Start Hour 2": None,
+        "End Hour 2": None,
+        "Classroom Building 2": None,
+        "Classroom 2": None,
+    }
+    row.update(values)
+    return row
+
+
+@pytest.fixture
+def write_sheet(tmp_path):
+    def write(rows: list, file: str = "SearchResults.xlsx") -> tuple:
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(sheet_columns)
+        for row in rows:
+            sheet.append([row.get(column) for column in sheet_columns])
+        workbook.save(tmp_path / file)
+        return file, str(tmp_path) + os.sep
+    return write
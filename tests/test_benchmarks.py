@@ -0,0 +1,41 @@
+import mongomock.collection
+from src.benchmarks.Ingestion import mock_methods, run_benchmark
+from src.benchmarks.Synthetic import SyntheticData, columns
+from src.mainAPI.courses.db.Connector import main_conn
+from src.mainAPI.courses.db.Parser import Parser, _split_file_path
+from src.mainAPI.courses.db import MongoDB as db
+
+
+def test_synthetic_rows_are_deterministic():
+    rows = list(SyntheticData(seed=1, courses=5).rows(30))
+    assert rows == list(SyntheticData(seed=1, courses=5).rows(30))
+    assert rows != list(SyntheticData(seed=2, courses=5).rows(30))
+    assert all(set(row) == set(columns) for row in rows)
+    # Keys of the records are unique.
+    assert len({(row["Semester"], row["Course Code"], row["Course Section"]) for row in rows}) == 30
+
+
+def test_synthetic_files_are_ingested(database, tmp_path):
+    files = SyntheticData(seed=1, courses=5).write(count=25, path=str(tmp_path), rows_per_file=10)
+    assert len(files) == 3
+    for file_path in files:
+        file, path = _split_file_path(file_path)
+        Parser().load(file=file, path=path, stream=True).parse(bulk=True)
+    assert db.Record.objects.count() == 25
+
+
+def test_ingestion_benchmark_runs_on_the_mock(database, monkeypatch):
+    monkeypatch.setattr(main_conn, "name", main_conn.name)
+    methods = dict(mongomock.collection.Collection.__dict__)
+
+    row = run_benchmark(rows=24, mode="row", mock=True)
+    bulk = run_benchmark(rows=24, mode="bulk", mock=True, stream=True)
+
+    for result in (row, bulk):
+        assert (result["rows"], result["files"]) == (24, 1)
+        assert result["rows_per_second"] > 0 and result["peak_rss_mb"] > 0
+        assert result["queries_per_row"] == result["queries"] / 24
+    assert 0 < bulk["queries"] < row["queries"]
+    assert db.Record.objects.count() == 24
+    # Counted methods of the mock are restored after each run.
+    assert all(mongomock.collection.Collection.__dict__[name] is methods[name] for name in mock_methods)
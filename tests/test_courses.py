@@ -0,0 +1,103 @@
+import pytest
+from src.mainAPI.courses.Courses import Course, record_templates
+from src.mainAPI.courses.db.Parser import Parser
+from src.mainAPI.courses.db import MongoDB as db
+from tests.conftest import sheet_row
+
+
+@pytest.fixture
+def course(database, write_sheet):
+    file, path = write_sheet(
+        [sheet_row(index * 3) for index in range(1, 4)] +
+        [sheet_row(index * 3, semester="2021-2022 Spring") for index in range(1, 3)]
+    )
+    Parser().load(file=file, path=path).parse(bulk=True)
+    return Course(2360100)
+
+
+def test_joins_project_inside_the_lookups():
+    for template in record_templates.values():
+        for stage in template.pipeline:
+            if "$lookup" in stage:
+                lookup = stage["$lookup"]
+                assert set(lookup) == {"from", "localField", "foreignField", "pipeline", "as"}
+                assert [next(iter(step)) for step in lookup["pipeline"]] == ["$project"]
+
+
+def test_records_carry_only_the_joined_fields(course):
+    records = course.get_records_list()
+    assert [(record["semesterId"], record["courseSection"]) for record in records] == [
+        (20221, 3), (20221, 6), (20221, 9), (20212, 3), (20212, 6)
+    ]
+    assert records[0] == {
+        "semesterId": 20221,
+        "semesterName": "2022-2023 Fall",
+        "courseSection": 3,
+        "courseCapacity": 40,
+        "courseStatus": "Open",
+        "instructorName": "INSTRUCTOR 1",
+        "instructorTitle": "Dr."
+    }
+
+
+def test_page_is_limited_after_the_joins(course):
+    db.Instructor.objects(name="INSTRUCTOR 1").delete()
+    records = course.get_records_list(limit=2)
+    assert [(record["semesterId"], record["courseSection"]) for record in records] == [(20221, 6), (20212, 6)]
+
+
+def test_pages_follow_the_last_record(course):
+    records = course.get_records_list(after=(20221, 6), limit=2)
+    assert [(record["semesterId"], record["courseSection"]) for record in records] == [(20221, 9), (20212, 3)]
+
+
+def test_optimized_look_up_returns_the_same_records(course):
+    optimized = Course._record_look_up(course_id=2360100)
+    plain = optimized.copy()
+    plain.optimize_flag = False
+    plain.cache_flag = optimized.cache_flag = False
+
+    records = list(optimized.run())
+    assert optimized.pipeline[0] == {"$match": {"course": 2360100}}
+    assert len(records) == 5
+    assert records == list(plain.run())
+
+
+def test_streamed_records_are_the_same_with_the_list(course):
+    assert list(course.stream_records(batch_size=2)) == course.get_records_list()
+    assert list(course.stream_records(after=(20221, 9), limit=1)) == course.get_records_list(after=(20221, 9), limit=1)
+
+
+def test_bound_templates_are_the_same_with_built_pipelines(database):
+    for after, limit in [(None, None), ((20221, 3), None), (None, 10), ((20221, 3), 10)]:
+        bound = Course(2360100).get_records(simplified=False, after=after, limit=limit)
+        built = Course._build_records(course_id=2360100, simplified=False, after=after, limit=limit).optimize()
+        assert bound.pipeline == built.pipeline
+
+
+def test_course_is_read_from_the_collection(course):
+    assert course.get_course_name() == "COURSE 0"
+    assert course.get_course_data() == {"_id": 2360100, "name": "COURSE 0"}
+    document = course.get_course()
+    assert isinstance(document, db.Course) and document.name == "COURSE 0"
+    assert Course(1).get_course() is None
+
+
+def test_entities_are_fetched_once_until_refreshed(course):
+    records = course.get_records_list()
+    assert course.get_course_name() == "COURSE 0"
+    db.Course.objects(id=2360100).update(set__name="RENAMED")
+    db.Record.objects.delete()
+
+    assert course.get_course_name() == "COURSE 0"
+    assert course.get_records_list() is records
+    course.refresh()
+    assert course.get_course_name() == "RENAMED"
+
+
+def test_data_frames_are_built_from_the_records(course):
+    records = course.get_records_df(limit=2)
+    assert list(records["courseSection"]) == [3, 6]
+    assert course.get_records_df(limit=2) is records
+    assert course.get_course_df().loc["name", "course"] == "COURSE 0"
+    assert course.get_all_course_ids() == [{"label": 2360100}]
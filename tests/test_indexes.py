@@ -0,0 +1,17 @@
+from src.mainAPI.courses.db.Parser import Parser
+from src.mainAPI.courses.db import MongoDB as db
+from tests.conftest import sheet_row
+
+
+def test_reading_does_not_create_indexes(database):
+    assert db.Record.objects(section=1).first() is None
+    assert set(db.Record._get_collection().index_information()) <= {"_id_"}
+
+
+def test_ingestion_ensures_indexes(database, write_sheet):
+    file, path = write_sheet([sheet_row(1)])
+    Parser().load(file=file, path=path).parse(bulk=True)
+
+    keys = [index["key"] for index in db.Record._get_collection().index_information().values()]
+    assert [("semester", 1), ("course", 1), ("section", 1)] in keys
+    assert [("course", 1), ("semester", -1), ("section", 1)] in keys
@@ -0,0 +1,161 @@
+import datetime
+import pytest
+from openpyxl import load_workbook
+from src.mainAPI.courses.db.Helper import DimensionCache
+from src.mainAPI.courses.db.Manifest import IngestionManifest
+from src.mainAPI.courses.db.Parser import Parser, _collect_dimensions
+from src.mainAPI.courses.db import MongoDB as db
+from src.utils.Utils import schedule_slots_key
+from tests.conftest import sheet_row
+
+
+def _without_slots(rows: list) -> list:
+    return [
+        {key: value for key, value in row.items() if key != schedule_slots_key}
+        for row in rows
+    ]
+
+
+def test_streamed_rows_are_the_same_with_loaded_rows(write_sheet):
+    # Capacity has an empty cell, so its column is read as floats by pandas.
+    file, path = write_sheet([
+        sheet_row(1, **{"Start Hour 1": datetime.time(8, 40), "End Hour 1": datetime.time(10, 30)}),
+        sheet_row(2, **{"Capacity": None, "Exchange Capacity": 5}),
+        sheet_row(3, **{"Exchange Used Capacity": datetime.datetime(2023, 1, 2, 8, 40)}),
+    ])
+    loaded = Parser().load(file=file, path=path).data
+    streamed = list(Parser().load(file=file, path=path, stream=True).data)
+
+    assert _without_slots(streamed) == _without_slots(loaded)
+    assert loaded[0]["Capacity"] == 40 and isinstance(loaded[0]["Capacity"], int)
+    assert loaded[0]["Start Hour 1"] == "08:40:00"
+    assert loaded[2]["Exchange Used Capacity"] == "2023-01-02T08:40:00.000"
+
+
+def _ingest(write_sheet, rows: list, **options):
+    file, path = write_sheet(rows)
+    Parser().load(file=file, path=path, stream=options.pop("stream", False), incremental=True).parse(**options)
+
+
+@pytest.mark.parametrize("options", [dict(), dict(bulk=True), dict(bulk=True, stream=True)])
+def test_incremental_ingestion_updates_changed_rows(database, write_sheet, options):
+    _ingest(write_sheet, [sheet_row(1), sheet_row(2)], **dict(options))
+    _ingest(write_sheet, [sheet_row(1, Capacity=55), sheet_row(2), sheet_row(3)], **dict(options))
+
+    records = {record.section: record for record in db.Record.objects}
+    assert sorted(records) == [1, 2, 3]
+    assert records[1].capacity == 55
+    assert records[2].capacity == 40
+    manifest = db.Manifest.objects(file="SearchResults.xlsx").first()
+    assert manifest.rowCount == 3
+
+
+def test_loaded_schedule_is_built_from_converted_rows(database, write_sheet):
+    file, path = write_sheet([
+        sheet_row(1, **{"Start Hour 1": datetime.time(8, 40), "End Hour 1": datetime.time(10, 30)}),
+    ])
+    parser = Parser().load(file=file, path=path)
+    streamed = list(Parser().load(file=file, path=path, stream=True).data)
+    assert parser.data == streamed
+    assert parser.data[0][schedule_slots_key][0]["Start Hour"] == "08:40:00"
+
+    parser.parse()
+    assert [(time.start, time.end) for time in db.Time.objects] == [("08:40:00", "10:30:00")]
+
+
+def _counts() -> dict:
+    return {
+        doc_cls.__name__: doc_cls.objects.count()
+        for doc_cls in (db.Semester, db.Course, db.Instructor, db.Class, db.Time, db.Day, db.Schedule, db.Record)
+    }
+
+
+def test_dimensions_are_looked_up_once(database, write_sheet, monkeypatch):
+    stats = list()
+    clear = DimensionCache.clear
+
+    def recorded(cache):
+        stats.append((cache.hits, cache.misses))
+        return clear(cache)
+
+    monkeypatch.setattr(DimensionCache, "clear", recorded)
+    file, path = write_sheet([sheet_row(index) for index in range(1, 13)])
+    Parser().load(file=file, path=path).parse()
+
+    # Each row looks up 7 dimensions and its record. Only the first look up of each
+    # of the 12 distinct dimensions and of each record is a miss, the rest are hits.
+    assert stats[-1] == (12 * 8 - 12 - 12, 12 + 12)
+    assert _counts() == {
+        "Semester": 1, "Course": 3, "Instructor": 2, "Class": 2, "Time": 1, "Day": 1, "Schedule": 2, "Record": 12
+    }
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_bulk_ingestion_writes_the_same_documents(database, write_sheet, stream):
+    rows = [sheet_row(index, **{"Day 2": "Friday", "Start Hour 2": "13:40", "End Hour 2": "15:30"})
+            for index in range(1, 5)]
+    file, path = write_sheet(rows)
+    Parser().load(file=file, path=path).parse()
+    expected = _counts()
+    references = {record.section: (record.instructor.name, len(record.schedule)) for record in db.Record.objects}
+    for doc_cls in (db.Semester, db.Course, db.Instructor, db.Class, db.Time, db.Day, db.Schedule, db.Record):
+        doc_cls.objects.delete()
+
+    Parser().load(file=file, path=path, stream=stream).parse(bulk=True, batch_size=3)
+    assert _counts() == expected
+    assert {record.section: (record.instructor.name, len(record.schedule)) for record in db.Record.objects} == references
+
+
+def test_dimensions_of_files_are_collected_once(write_sheet):
+    file, path = write_sheet([sheet_row(1), sheet_row(7), sheet_row(2, Capacity=10)])
+    rows = _collect_dimensions(path + file)
+
+    assert len(rows) == 2
+    assert all("Capacity" not in row and "Course Section" not in row for row in rows)
+    assert sorted(row["Course Code"] for row in rows) == [2360101, 2360102]
+
+
+def test_unchanged_file_is_skipped(database, write_sheet):
+    file, path = write_sheet([sheet_row(1)])
+    Parser().load(file=file, path=path, incremental=True).parse()
+    parser = Parser().load(file=file, path=path, incremental=True)
+    assert not parser.load_flag
+
+
+def test_upsert_updates_existing_records(database, write_sheet):
+    file, path = write_sheet([sheet_row(1), sheet_row(2)])
+    Parser().load(file=file, path=path).parse(bulk=True)
+    file, path = write_sheet([sheet_row(1, Capacity=55, **{"Course Status": "Closed"}), sheet_row(2)])
+    Parser().load(file=file, path=path).parse(upsert=True)
+
+    records = {record.section: record for record in db.Record.objects}
+    assert len(records) == 2
+    assert (records[1].capacity, records[1].status) == (55, "Closed")
+    assert records[2].capacity == 40
+
+
+def test_first_sheet_is_streamed_whichever_sheet_is_active(write_sheet):
+    file, path = write_sheet([sheet_row(1), sheet_row(2)])
+    workbook = load_workbook(path + file)
+    notes = workbook.create_sheet("Notes")
+    notes.append(["Note"])
+    notes.append(["Exported rows"])
+    workbook.active = workbook.index(notes)
+    workbook.save(path + file)
+
+    streamed = list(Parser().load(file=file, path=path, stream=True).data)
+    assert streamed == Parser().load(file=file, path=path).data
+    assert [row["Course Section"] for row in streamed] == [1, 2]
+
+
+def test_row_hashes_are_kept_out_of_the_manifest(database, write_sheet):
+    _ingest(write_sheet, [sheet_row(1), sheet_row(2), sheet_row(3)])
+    # Manifests written before keep their row hashes in the document.
+    database["manifest"].update_one({"_id": "SearchResults.xlsx"}, {"$set": {"rows": {"old": "hash"}}})
+    _ingest(write_sheet, [sheet_row(1), sheet_row(2, Capacity=55)])
+
+    rows = {row.key: row.hash for row in db.ManifestRow.objects(file="SearchResults.xlsx")}
+    assert sorted(rows) == ["20221:2360101:1", "20221:2360102:2"]
+    assert rows["20221:2360102:2"] == IngestionManifest.row_hash(sheet_row(2, Capacity=55))
+    assert "rows" not in database["manifest"].find_one({"_id": "SearchResults.xlsx"})
+    assert db.Record.objects(section=2).first().capacity == 55
@@ -0,0 +1,24 @@
+import os
+import sys
+from src.mainAPI.courses.db.Parser import Parser
+from src.restAPI import Prerender
+from src.restAPI.Prerender import PrerenderedPages
+from tests.conftest import sheet_row
+
+
+def test_default_path_is_under_the_project():
+    assert PrerenderedPages().path == os.path.join(
+        Prerender.root_path, "src", "restAPI", "build", "prerendered", ""
+    )
+
+
+def test_pages_are_rendered_outside_of_the_project(database, write_sheet, tmp_path, monkeypatch):
+    file, path = write_sheet([sheet_row(1)])
+    Parser().load(file=file, path=path).parse(bulk=True)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "path", [item for item in sys.path if item not in ("", Prerender.root_path)])
+    monkeypatch.delitem(sys.modules, "start", raising=False)
+
+    rendered = Prerender._render_pages([(2360101, 1)], str(tmp_path) + os.sep, "start:app")
+    assert rendered == [(2360101, 1)]
+    assert "COURSE 1" in PrerenderedPages(path=str(tmp_path)).read(2360101, 1)
@@ -0,0 +1,133 @@
+import threading
+import pytest
+from src.utils import config
+from src.mainAPI.courses.db.Query import Parameter, QueryPipeline, query_cache, slow_logger
+from src.mainAPI.courses.db.Version import bump_version, version_tracker
+from src.mainAPI.courses.db import MongoDB as db
+from src.mainAPI.courses.db.Parser import Parser
+from tests.conftest import sheet_row
+
+
+def test_fingerprint_keeps_the_order_of_sort_keys():
+    first = QueryPipeline(db.Record).sort({"semester": -1, "section": 1})
+    second = QueryPipeline(db.Record).sort({"section": 1, "semester": -1})
+    assert first.fingerprint() != second.fingerprint()
+    assert first.fingerprint() == first.copy().fingerprint()
+
+
+def test_profile_flag_is_given_by_config(monkeypatch):
+    monkeypatch.setattr(config, "query_profile", True)
+    assert QueryPipeline(db.Record).profile_flag
+    assert not QueryPipeline(db.Record, profile=False).profile_flag
+
+
+def test_slow_pipeline_is_explained_out_of_the_request(database, monkeypatch):
+    db.Day(day="Monday").save()
+    explained = threading.Event()
+    released = threading.Event()
+
+    def explain(query, *args, **kwargs):
+        released.wait(timeout=5)
+        explained.set()
+        return list()
+
+    monkeypatch.setattr(QueryPipeline, "explain", explain)
+    monkeypatch.setattr(config, "slow_query_explain_rate", 1)
+    result = QueryPipeline(db.Day, profile=True, slow_threshold=0).run()
+
+    assert result == [{"_id": "Monday"}]
+    assert not explained.is_set()
+    released.set()
+    assert explained.wait(timeout=5)
+
+
+def test_unsampled_slow_pipeline_is_logged_without_examined_counts(database, monkeypatch):
+    db.Day(day="Monday").save()
+    messages = list()
+
+    def explain(query, *args, **kwargs):
+        raise AssertionError("The pipeline is not sampled.")
+
+    monkeypatch.setattr(QueryPipeline, "explain", explain)
+    monkeypatch.setattr(slow_logger, "warning", messages.append)
+    monkeypatch.setattr(config, "slow_query_explain_rate", 0)
+    QueryPipeline(db.Day, profile=True, slow_threshold=0).run()
+
+    assert len(messages) == 1
+    assert "RETURNED: 1, " in messages[0] and "EXAMINED" not in messages[0]
+
+
+def test_match_on_joined_id_is_moved_before_the_projected_join():
+    query = QueryPipeline(db.Record).join(
+        "course", "course", "_id", "course", fields=["name"], single=True
+    ).match({"course._id": 2360100}).optimize()
+    assert query.pipeline[0] == {"$match": {"course": 2360100}}
+    assert [next(iter(stage)) for stage in query.pipeline] == ["$match", "$lookup", "$unwind"]
+
+
+@pytest.mark.parametrize("condition, count", [
+    ("schedule", 2), ({"$in": ["schedule"]}, 2), ({"$ne": "schedule"}, 6)
+])
+def test_match_on_joined_array_keeps_the_other_elements_out(database, write_sheet, condition, count):
+    second_day = {
+        "Day 2": "Tuesday", "Start Hour 2": "13:40", "End Hour 2": "15:30",
+        "Classroom Building 2": "BUILDING", "Classroom 2": "ROOM 2"
+    }
+    file, path = write_sheet([sheet_row(index, **second_day) for index in range(4)])
+    Parser().load(file=file, path=path).parse(bulk=True)
+    schedule = db.Schedule.objects.first().pk
+    if isinstance(condition, dict):
+        condition = {key: [schedule] if key == "$in" else schedule for key in condition}
+    else:
+        condition = schedule
+
+    def build(optimize: bool) -> QueryPipeline:
+        return QueryPipeline(db.Record, optimize=optimize).join(
+            "schedule", "schedule", "_id", "schedule"
+        ).parallelize("schedule").match({"schedule._id": condition})
+
+    optimized, plain = build(True), build(False)
+    records = list(optimized.run())
+    assert len(records) == count
+    assert records == list(plain.run())
+    assert optimized.pipeline[-1] == {"$match": {"schedule._id": condition}}
+    if not isinstance(condition, dict) or "$in" in condition:
+        assert optimized.pipeline[0] == {"$match": {"schedule": condition}}
+
+
+def test_match_on_other_joined_fields_stays_after_the_join():
+    query = QueryPipeline(db.Record).join(
+        "course", "course", "_id", "course", single=True
+    ).match({"course.name": "COURSE 1"}).optimize()
+    assert [next(iter(stage)) for stage in query.pipeline] == ["$lookup", "$unwind", "$match"]
+
+
+def test_cached_results_are_dropped_when_the_version_is_bumped(database):
+    db.Day(day="Monday").save()
+    query = QueryPipeline(db.Day, cache=True)
+    hits = query_cache.hits
+    assert query.copy().run() == [{"_id": "Monday"}]
+    db.Day(day="Tuesday").save()
+    assert query.copy().run() == [{"_id": "Monday"}]
+    assert query_cache.hits == hits + 1
+
+    bump_version()
+    version_tracker.reset()
+    assert query.copy().run() == [{"_id": "Monday"}, {"_id": "Tuesday"}]
+
+
+def test_binding_a_template_does_not_change_it():
+    template = QueryPipeline(db.Record).match(
+        {"course": Parameter("course_id"), "section": {"$gt": Parameter("section")}}
+    ).sort({"section": 1}).compile()
+    assert template.names == {"course_id", "section"}
+
+    query = template.bind(course_id=2360100, section=3)
+    assert query.pipeline == [
+        {"$match": {"course": 2360100, "section": {"$gt": 3}}},
+        {"$sort": {"section": 1}}
+    ]
+    assert isinstance(template.pipeline[0]["$match"]["course"], Parameter)
+    assert query.pipeline[1] is template.pipeline[1]
+    with pytest.raises(ValueError):
+        template.bind(course_id=2360100)
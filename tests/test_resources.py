@@ -0,0 +1,94 @@
+import json
+import pytest
+from src.mainAPI.courses.Courses import Course
+from src.mainAPI.courses.db.Parser import Parser
+from src.mainAPI.courses.db.Version import bump_version, course_key, version_tracker
+from src.restAPI.resorces.courses import RecordsTable
+from tests.conftest import sheet_row
+
+
+def _records(count: int) -> list:
+    return [{"semesterId": 20221, "courseSection": section} for section in range(1, count + 1)]
+
+
+def test_records_table_has_next_page_only_if_more_records_are_loaded():
+    table = RecordsTable(load=lambda: _records(3), limit=2)
+    html = "".join(table)
+    assert table.next_after == "20221-2"
+    assert "2 rows" in html
+
+    table = RecordsTable(load=lambda: _records(2), limit=2)
+    "".join(table)
+    assert table.next_after is None
+
+
+def test_autocomplete_suggests_courses_by_name(client, write_sheet):
+    file, path = write_sheet([sheet_row(1), sheet_row(2)])
+    Parser().load(file=file, path=path).parse(bulk=True)
+
+    response = client.get("/api/v1/courses/autocomplete?q=course 2")
+    assert response.get_json() == [{"label": "2360102", "value": "COURSE 2"}]
+    page = client.get("/api/v1/courses").get_data(as_text=True)
+    assert 'type="text"' in page and "filter: false" in page
+
+
+@pytest.fixture
+def ingested(client, write_sheet):
+    file, path = write_sheet(
+        [sheet_row(index) for index in range(1, 10)] +
+        [sheet_row(index, semester="2021-2022 Spring") for index in range(1, 4)]
+    )
+    Parser().load(file=file, path=path).parse(bulk=True)
+    return client
+
+
+def test_batch_returns_records_of_each_course_in_order(ingested):
+    response = ingested.get("/api/v1/courses/batch?ids=2360102,1&ids=2360100")
+    courses = response.get_json()["courses"]
+    assert [course["courseId"] for course in courses] == [2360102, 1, 2360100]
+    assert courses[1]["records"] == list()
+    for course in (courses[0], courses[2]):
+        records = Course(course["courseId"]).get_records_list()
+        assert [record["courseSection"] for record in course["records"]] == \
+            [record["courseSection"] for record in records]
+        assert all(record["courseId"] == course["courseId"] for record in course["records"])
+
+
+def test_records_are_served_as_json_and_ndjson(ingested):
+    records = Course(2360100).get_records_list()
+    assert ingested.get("/api/v1/courses/2360100/records").get_json() == records
+
+    response = ingested.get("/api/v1/courses/2360100/records?format=ndjson&limit=2&after=20221-3")
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == Course(2360100).get_records_list(after=(20221, 3), limit=2)
+
+
+def test_unchanged_course_is_answered_not_modified(ingested):
+    response = ingested.get("/api/v1/courses/2360100/records")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200 and response.get_json()
+
+    assert ingested.get("/api/v1/courses/2360100/records", headers={"If-None-Match": etag}).status_code == 304
+    # Versions of the other courses do not change the validators of a course.
+    bump_version(keys=[course_key(2360101)])
+    version_tracker.reset()
+    assert ingested.get("/api/v1/courses/2360100/records", headers={"If-None-Match": etag}).status_code == 304
+
+    bump_version(keys=[course_key(2360100)])
+    version_tracker.reset()
+    response = ingested.get("/api/v1/courses/2360100/records", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.get_json()
+    assert response.headers["ETag"] != etag
+
+
+def test_result_page_is_streamed_with_its_records(ingested):
+    response = ingested.get("/api/v1/courses/2360100/?limit=2")
+    assert response.is_streamed
+    page = response.get_data(as_text=True)
+    assert "Course Name: COURSE 0" in page
+    assert "2 rows" in page
+    assert "after=20221-6" in page
+
+    page = ingested.get("/api/v1/courses/2360100/?limit=2&after=20221-9").get_data(as_text=True)
+    assert "1 rows" in page and "next_page" not in page
@@ -0,0 +1,23 @@
+from src.mainAPI.courses.Search import CourseIndex
+from src.mainAPI.courses.db.Version import VersionTracker, bump_version
+from src.mainAPI.courses.db import MongoDB as db
+
+
+def test_courses_are_found_by_prefixes_of_ids_and_names(database):
+    db.Course(id=2360111, name="Introduction To Computer Science").save()
+    db.Course(id=2360112, name="Data Structures").save()
+    index = CourseIndex(tracker=VersionTracker(check_interval=0))
+
+    assert index.search("236011") == [
+        (2360111, "Introduction To Computer Science"), (2360112, "Data Structures")
+    ]
+    assert index.search("STRUC") == [(2360112, "Data Structures")]
+    assert index.search("comp", limit=1) == [(2360111, "Introduction To Computer Science")]
+    assert index.search(" ") == list()
+
+    db.Course(id=5710001, name="Computer Networks").save()
+    assert index.search("computer") == [(2360111, "Introduction To Computer Science")]
+    bump_version()
+    assert index.search("computer") == [
+        (2360111, "Introduction To Computer Science"), (5710001, "Computer Networks")
+    ]
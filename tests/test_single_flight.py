@@ -0,0 +1,44 @@
+import threading
+from src.mainAPI.courses.SingleFlight import SingleFlight
+
+
+class _WaitedEvent(threading.Event):
+    def __init__(self, waiting: threading.Event):
+        super().__init__()
+        self.waiting = waiting
+
+    def wait(self, timeout=None):
+        self.waiting.set()
+        return super().wait(timeout)
+
+
+def test_waiters_get_copies_of_the_result():
+    single_flight = SingleFlight(timeout=5)
+    started = threading.Event()
+    released = threading.Event()
+    waiting = threading.Event()
+    calls = list()
+
+    def load():
+        calls.append(1)
+        started.set()
+        released.wait(timeout=5)
+        return [{"courseSection": 1}]
+
+    results = dict()
+    leader = threading.Thread(target=lambda: results.setdefault("leader", single_flight.do("key", load)))
+    leader.start()
+    started.wait(timeout=5)
+    # The waiter signals when it waits for the call in flight.
+    single_flight.calls["key"].event = _WaitedEvent(waiting)
+    waiter = threading.Thread(target=lambda: results.setdefault("waiter", single_flight.do("key", load)))
+    waiter.start()
+    waiting.wait(timeout=5)
+    released.set()
+    leader.join(timeout=5)
+    waiter.join(timeout=5)
+
+    assert len(calls) == 1 and single_flight.shared == 1
+    assert results["waiter"] == results["leader"]
+    results["waiter"][0]["courseSection"] = 2
+    assert results["leader"] == [{"courseSection": 1}]
@@ -0,0 +1,40 @@
+import datetime
+import json
+import pandas as pd
+import pytest
+from src.utils import Utils
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_json_encodes_nan_as_null(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(Utils, "orjson", None)
+    data = {"capacity": float("nan"), "sections": [1, float("inf")], "updated": datetime.date(2023, 1, 2)}
+    assert json.loads(Utils.dumps_json(data)) == {
+        "capacity": None, "sections": [1, None], "updated": "2023-01-02"
+    }
+
+
+@pytest.mark.parametrize("records", [
+    [
+        {"semesterId": 20221, "semesterName": "2022-2023 Fall", "courseCapacity": 40, "instructorName": "A & <B>"},
+        {"semesterId": 20212, "semesterName": "2021-2022 Spring", "instructorName": None},
+        {"semesterId": 20211, "semesterName": "2021-2022 Fall", "courseCapacity": 12.5, "instructorName": "C"},
+    ],
+    [{"courseSection": section, "courseCapacity": None if section % 2 else section} for section in range(1, 30)],
+    [],
+])
+def test_html_table_is_the_same_with_dataframe_html(records):
+    assert Utils.render_html_table(records) == Utils.convert_df_to_html(pd.DataFrame(records), index=False)
+
+
+def test_html_table_with_index_is_the_same_with_dataframe_html():
+    course = {"_id": 2360100, "name": "COURSE 0", "credit": 3.0}
+    html = Utils.render_html_table(
+        records=({"course": value} for value in course.values()),
+        columns=["course"],
+        index=list(course.keys())
+    )
+    assert html == Utils.convert_df_to_html(pd.Series(course).to_frame(name="course"))